@@ -1,3 +1,9 @@
+import os
+
+if __name__ == '__main__':
+    # Known before the app is created, so the debug reloader's parent process skips the pipeline warm-up
+    os.environ.setdefault('FLASK_DEBUG', '1')
+
 from app import create_app, db
 # from flask_cors import CORS
 
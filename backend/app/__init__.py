@@ -1,11 +1,17 @@
 import json
 import os
+import time
+from functools import partial
 from pathlib import Path
 from flask import Flask, jsonify
 from flask_migrate import Migrate, init, upgrade, migrate
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from sqlalchemy import event
+from werkzeug.serving import is_running_from_reloader
 
 
 db = SQLAlchemy()
@@ -24,8 +30,29 @@ def custom_invalid_token_response(error):
 
 
 
+def apply_sqlite_pragmas(dbapi_connection, connection_record, busy_timeout):
+    """Tunes every new SQLite connection for concurrent writers."""
+    
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+    cursor.close()
+
+
+def configure_database(app):
+    """Registers the SQLite connection pragmas when the app runs on SQLite with tuning enabled."""
+    
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') or not app.config['SQLITE_TUNING']:
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'connect',
+                     partial(apply_sqlite_pragmas, busy_timeout=app.config['SQLITE_BUSY_TIMEOUT']))
+
+
 def setup_migrations(app):
-    """Initialize and run migrations automatically."""
+    """Initialize, autogenerate and apply migrations (development mode and `flask sync-migrations`)."""
     
     with app.app_context():
         if not os.path.exists("migrations"):
@@ -41,19 +68,67 @@ def setup_migrations(app):
         upgrade()
 
 
+def upgrade_if_needed(app):
+    """
+    Applies pending migrations without autogenerating any (production mode).
+
+    Only compares the database's Alembic revision with the head revision of the
+    migrations folder, and runs `upgrade` when they differ.
+    """
+    
+    from app.log import logger
+    
+    with app.app_context():
+        if not os.path.exists(migrate_db.directory):
+            logger.warning(f"⚠️ No migrations folder '{migrate_db.directory}', run `flask sync-migrations` to create it.")
+            return
+
+        heads = set(ScriptDirectory.from_config(migrate_db.get_config()).get_heads())
+        with db.engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+
+        if current == heads:
+            logger.info(f"Database schema is at head revision {', '.join(heads) or '(empty)'}")
+            return
+
+        logger.info(f"Upgrading database schema from {', '.join(current) or '(none)'} to {', '.join(heads)}...")
+        upgrade()
+
+
+def sync_message_counts(app):
+    """Backfills the per-chat message counter after the migration that added it (a no-op afterwards)."""
+    
+    from app.context import backfill_message_counts, message_counts_stale
+    from app.log import logger
+    
+    with app.app_context():
+        try:
+            if not message_counts_stale():
+                return
+            updated = backfill_message_counts()
+            logger.info(f"✅ Backfilled the message count of {updated} chats")
+
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️ Message count backfill skipped, run `flask chats backfill-message-count`: {e}")
+
+
 def create_app():
     """Initialize the Flask App."""
 
+    start = time.perf_counter()
     flask_app = Flask(__name__)
     flask_app.config.from_object('app.config.AppConfig')
+    mode = flask_app.config['MIGRATIONS_MODE']
 
    
     db.init_app(flask_app)
+    configure_database(flask_app)
     jwt.init_app(flask_app)
     migrate_db.init_app(flask_app, db)
     
     path = Path(os.getcwd(),'instance','rag.db')
-    if not path.exists():
+    if not path.exists() and (mode == 'auto' or not os.path.exists(migrate_db.directory)):
         with flask_app.app_context():
             import app.models
             db.create_all()
@@ -62,12 +137,37 @@ def create_app():
             
     CORS(flask_app, origins=["http://localhost:8080"], supports_credentials=True)
         
-    from app.api import  auth, chats, user
+    from app.api import  auth, chats, health, user
     flask_app.register_blueprint(auth.auth_bp, url_prefix='/auth')
     flask_app.register_blueprint(chats.chats_bp,url_prefix='/chat')
     flask_app.register_blueprint(user.user_bp, url_prefix='/user')
+    flask_app.register_blueprint(health.health_bp)
+
+    @flask_app.cli.command('sync-migrations')
+    def sync_migrations():
+        """Autogenerate and apply migrations for model changes."""
+        setup_migrations(flask_app)
+        sync_message_counts(flask_app)
+
+    migrations_start = time.perf_counter()
+    if mode == 'auto':
+        setup_migrations(flask_app)
+    elif mode == 'upgrade':
+        upgrade_if_needed(flask_app)
+    if mode != 'off':
+        sync_message_counts(flask_app)
+    migrations_time = time.perf_counter() - migrations_start
+
+    from app.config import RagConfig
+    from app.log import logger
+    from app.pipeline import pipeline
+    # Under the debug reloader only the serving child process warms up, not the watching parent
+    if RagConfig.PIPELINE_WARMUP and (not flask_app.debug or is_running_from_reloader()):
+        pipeline.start()
+
+    logger.info(f"✅ App created in {time.perf_counter() - start:.2f}s "
+                f"(migrations '{mode}': {migrations_time:.2f}s)")
 
-    setup_migrations(flask_app)
     return flask_app
 
 
@@ -0,0 +1,152 @@
+import math
+import time
+import faiss
+import numpy as np
+from app.config import RagConfig
+from app.log import logger
+
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf')
+
+
+def build_index(vectors, index_type=None):
+    """
+    Builds a FAISS index of the configured type over the given vectors.
+
+    Args:
+        vectors: A float32 matrix of shape (n, d), in docstore order.
+        index_type: 'flat' (exact), 'hnsw' or 'ivf'. Defaults to RagConfig.INDEX_TYPE.
+
+    Returns:
+        The populated FAISS index; vector i keeps position i.
+    """
+
+    index_type = index_type or RagConfig.INDEX_TYPE
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    n, d = vectors.shape
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(d)
+
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, RagConfig.HNSW_M)
+        index.hnsw.efConstruction = RagConfig.HNSW_EF_CONSTRUCTION
+
+    elif index_type == 'ivf':
+        nlist = RagConfig.IVF_NLIST or max(1, min(n // 39, int(4 * math.sqrt(n))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, nlist)
+        index.train(vectors)
+
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of: {', '.join(INDEX_TYPES)}.")
+
+    index.add(vectors)
+    configure_index(index)
+    return index
+
+
+def configure_index(index):
+    """
+    Applies the search-time parameters (efSearch, nprobe) from the configuration.
+
+    IVF indexes also get a direct map so stored vectors can be reconstructed (needed by MMR).
+    """
+
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = RagConfig.HNSW_EF_SEARCH
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = RagConfig.IVF_NPROBE
+        ivf.make_direct_map()
+
+    return index
+
+
+def index_vectors(index):
+    """Returns all stored vectors of an index as an (n, d) float32 matrix."""
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def to_flat(index):
+    """Returns an exact flat copy of an index, with the same vector positions."""
+
+    if isinstance(index, faiss.IndexFlat):
+        return index
+
+    flat = faiss.IndexFlatL2(index.d)
+    flat.add(index_vectors(index))
+    return flat
+
+
+def held_out_queries(vectors, count, seed=0):
+    """
+    Synthesizes held-out queries that are not stored in the index.
+
+    Each query is the normalized midpoint of two random stored vectors plus a little noise.
+    """
+
+    rng = np.random.default_rng(seed)
+    a = vectors[rng.integers(0, len(vectors), count)]
+    b = vectors[rng.integers(0, len(vectors), count)]
+
+    queries = (a + b) / 2 + rng.normal(0, 0.01, size=a.shape).astype('float32')
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+    return np.ascontiguousarray(queries, dtype='float32')
+
+
+def time_search(index, queries, k):
+    """Searches one query at a time and returns (ids, mean latency in ms)."""
+
+    ids = np.empty((len(queries), k), dtype='int64')
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        ids[i] = index.search(query.reshape(1, -1), k)[1][0]
+
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_report(index, flat_index, k=None, queries=None):
+    """
+    Measures recall@k and per-query latency of an index against the exact flat index.
+
+    Args:
+        index: The candidate (approximate) index.
+        flat_index: The exact flat index over the same vectors.
+        k: Number of neighbours compared (defaults to RagConfig.RECALL_K).
+        queries: Query matrix; defaults to RagConfig.RECALL_QUERIES synthesized held-out queries.
+
+    Returns:
+        A dict with recall@k and mean latencies of both indexes.
+    """
+
+    k = k or RagConfig.RECALL_K
+    if queries is None:
+        queries = held_out_queries(index_vectors(flat_index), RagConfig.RECALL_QUERIES)
+
+    exact, flat_ms = time_search(flat_index, queries, k)
+    approx, ann_ms = time_search(index, queries, k)
+
+    recall = float(np.mean([len(set(e) & set(a)) / k for e, a in zip(exact, approx)]))
+
+    report = {
+        'index_type': RagConfig.INDEX_TYPE,
+        'vectors': int(flat_index.ntotal),
+        'queries': int(len(queries)),
+        'k': k,
+        f'recall@{k}': round(recall, 4),
+        'flat_ms_per_query': round(flat_ms, 3),
+        'index_ms_per_query': round(ann_ms, 3),
+        'params': {
+            'hnsw_m': RagConfig.HNSW_M, 'ef_construction': RagConfig.HNSW_EF_CONSTRUCTION,
+            'ef_search': RagConfig.HNSW_EF_SEARCH, 'ivf_nlist': RagConfig.IVF_NLIST, 'nprobe': RagConfig.IVF_NPROBE
+        }
+    }
+    logger.info(f"Index recall report: {report}")
+
+    return report
@@ -1,13 +1,50 @@
-from flask import Blueprint
+import json
+import time
+import click
+from flask import Blueprint, Response, current_app, stream_with_context
 from flask import request, jsonify
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
 from app import db
-from app.rag import generate_summary, get_rag_reply_v2, get_title
-from app.models import  Chat, ShortTermMemory, LongTermMemory
+from app.config import AppConfig, RagConfig
+from app.rag import answer_batch, get_rag_reply_v2, get_title, llm_executor, stream_rag_reply, timed_call
+from app.jobs import enqueue_summary, start_workers
+from app.log import logger
+from app.context import ChatContext, add_message, backfill_message_counts, load_chat_context
+from app.models import  Chat
+from app.pagination import page_args
+from app.pipeline import pipeline
 
 
 chats_bp = Blueprint('chats', __name__)
 
+PLACEHOLDER_TITLE = 'New Chat'
+
+
+@chats_bp.before_request
+def require_pipeline():
+    """
+    Rejects chat requests (except reads) with 503 until the RAG pipeline is loaded.
+
+    Also starts the pipeline warm-up if it has not run (or is due for a retry), and the
+    background summary workers on the first chat request served by this process.
+    The JWT is checked first, so unauthenticated requests get their 401 and never
+    trigger the warm-up.
+    """
+    
+    # Reading chats and messages does not need the pipeline
+    if request.method in ('GET', 'OPTIONS'):
+        return None
+
+    verify_jwt_in_request()
+
+    if not pipeline.ready:
+        pipeline.start()
+        response = jsonify(error="The assistant is starting up, please retry shortly.", pipeline=pipeline.status())
+        response.headers['Retry-After'] = str(RagConfig.PIPELINE_RETRY_AFTER)
+        return response, 503
+
+    start_workers(current_app._get_current_object())
+
 
 
 @chats_bp.route('/new', methods=['POST'])
@@ -20,10 +57,9 @@ def create_chat():
         JSON body with a 'query' field representing the user's initial message.
 
     Process:
-        - Generates a title for the chat using the query.
-        - Creates a new Chat record.
-        - Generates a response using the RAG system.
-        - Stores the initial query and response in ShortTermMemory.
+        - Creates a new Chat record with a placeholder title.
+        - Generates the title and the RAG response concurrently.
+        - Stores the title, the initial query and the response.
 
     Returns:
         JSON response with the created chat data and HTTP 201 status,
@@ -39,18 +75,27 @@ def create_chat():
     if not query:
         return jsonify({'error': 'Query is required'}), 400
     
-    title = get_title(query)
-    
-    c = Chat(user_id = user_id, title = title)
+    c = Chat(user_id = user_id, title = PLACEHOLDER_TITLE)
     db.session.add(c)
     db.session.commit()
     
-    rag_output = get_rag_reply_v2(query, c)
+    context = ChatContext.new(c)
     
+    start = time.perf_counter()
+    title_future = llm_executor.submit(timed_call, get_title, query)
     
-    message = ShortTermMemory(chat_id = c.id, question = query, answer = rag_output)
-    db.session.add(message)
-    db.session.commit()
+    try:
+        rag_output, answer_time = timed_call(get_rag_reply_v2, query, context)
+    except Exception:
+        discard_chat(c, title_future)
+        raise
+
+    title_time = apply_title(c, title_future)
+    
+    # Stores the message and the title
+    add_message(context, query, rag_output)
+
+    log_fanout(c.id, start, title_time, answer_time)
 
     return jsonify(c.to_json()), 201
 
@@ -76,13 +121,17 @@ def llm_chat(chat_id):
     Returns:
         JSON response with chat or message data.
     """
-    chat = Chat.query.get(chat_id)
-    if not chat:
-        return jsonify(error='Chat not found'), 404
-
     if request.method == 'GET':
+        chat = Chat.query.get(chat_id)
+        if not chat:
+            return jsonify(error='Chat not found'), 404
+
         return jsonify(chat.to_json()), 200
 
+    # Chat, recent messages and summary in one query
+    context = load_chat_context(chat_id)
+    if context is None:
+        return jsonify(error='Chat not found'), 404
     
     data = request.get_json()
     query = data.get('query')
@@ -91,18 +140,341 @@ def llm_chat(chat_id):
         return jsonify({'error': 'Query is required'}), 400
 
     
-    answer = get_rag_reply_v2(query, chat)
+    answer = get_rag_reply_v2(query, context)
 
     # Store in short-term memory
-    message = ShortTermMemory(chat_id=chat_id, question=query, answer=answer)
-    db.session.add(message)
-    db.session.commit()
+    message = add_message(context, query, answer)
     
-    # Update long-term memory if more than 2 messages
-    if len(chat.messages) > 3:
-        updated_summary = generate_summary(chat)
+    # Update long-term memory in the background if more than 2 messages
+    if context.message_count > 3:
+        enqueue_summary(context.chat_id)
 
     return jsonify(message.to_json()), 200
 
 
 
+@chats_bp.route('/<int:chat_id>/messages', methods=['GET'])
+@jwt_required()
+def list_messages(chat_id):
+    """
+    Lists the messages of a chat one page at a time, from the newest page backwards.
+
+    Query parameters:
+        cursor: The `next_cursor` of the previous page (omit for the latest messages).
+        limit: Page size (default MESSAGES_PAGE_SIZE, at most MAX_PAGE_SIZE).
+
+    Returns:
+        JSON with 'messages' (chronological within the page) and 'next_cursor'
+        (null once the oldest message is reached), or a 400/404 error.
+    """
+    
+    chat = Chat.query.get(chat_id)
+    if not chat:
+        return jsonify(error='Chat not found'), 404
+
+    try:
+        cursor, limit = page_args(request.args, AppConfig.MESSAGES_PAGE_SIZE, AppConfig.MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(chat_id=chat.id, **chat.messages_page(cursor, limit)), 200
+
+
+
+def apply_title(chat, title_future):
+    """
+    Waits for a concurrent title generation and sets it on the chat (not committed).
+
+    The placeholder title is kept if title generation failed.
+
+    Returns:
+        The title generation time in seconds, or None on failure.
+    """
+    
+    try:
+        title, title_time = title_future.result()
+        chat.title = title
+        return title_time
+    
+    except Exception as e:
+        logger.error(f"❌ Title generation failed for chat {chat.id}: {e}", exc_info=True)
+        return None
+
+
+def discard_chat(chat, title_future):
+    """
+    Deletes a new chat whose first answer failed, so no empty placeholder chat is left
+    in the user's list, and cancels its title generation if it has not started.
+    """
+    
+    chat_id = chat.id
+    title_future.cancel()
+    db.session.rollback()
+    
+    db.session.delete(chat)
+    db.session.commit()
+    logger.warning(f"⚠️ Discarded new chat {chat_id}, its first answer failed")
+
+
+def log_fanout(chat_id, start, title_time, answer_time):
+    """Logs per-stage timings of the new chat title/answer fan-out."""
+    
+    title_msg = f"{title_time:.2f}s" if title_time is not None else "failed"
+    logger.info(f"New chat {chat_id} fan-out: title {title_msg}, answer {answer_time:.2f}s, "
+                f"total {time.perf_counter() - start:.2f}s")
+
+
+def sse_event(event, data):
+    """
+    Formats a single Server-Sent Event frame.
+
+    Args:
+        event: The event name (e.g. 'chat', 'token', 'done', 'error').
+        data: A JSON serializable payload.
+
+    Returns:
+        The encoded SSE frame string.
+    """
+    
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """Wraps an event generator into a streaming text/event-stream response."""
+    
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def stream_answer(query, context, on_stored):
+    """
+    Streams the RAG answer for a chat and persists it once the stream has ended.
+
+    Yields 'token' events while the LLM generates, then stores the ShortTermMemory row
+    and yields a final 'done' event with the stored message. On failure an 'error'
+    event is sent and nothing is persisted.
+
+    `on_stored` is called with the message as soon as it is committed, before the final
+    event, so callers know it was stored even if the client disconnects during that yield.
+    """
+    
+    chunks = []
+    try:
+        for token in stream_rag_reply(query, context):
+            chunks.append(token)
+            yield sse_event('token', {'token': token})
+    
+    except Exception as e:
+        logger.error(f"❌ Streaming reply failed for chat {context.chat_id}: {e}", exc_info=True)
+        yield sse_event('error', {'error': 'Failed to generate a reply'})
+        return
+
+    message = add_message(context, query, "".join(chunks))
+    on_stored(message)
+
+    yield sse_event('done', message.to_json())
+
+
+
+@chats_bp.route('/new/stream', methods=['POST'])
+@jwt_required()
+def create_chat_stream():
+    """
+    Create a new chat session and stream the first answer as Server-Sent Events.
+
+    Expects:
+        JSON body with a 'query' field representing the user's initial message.
+
+    Events:
+        - chat: the created chat metadata with a placeholder title, sent before generation starts.
+        - token: a chunk of the generated answer.
+        - done: the stored message once the answer is complete.
+        - title: the generated chat title, once both the title and the answer are complete.
+        - error: sent instead of 'done' if generation fails; the new chat is then deleted.
+
+    Returns:
+        A text/event-stream response, or an error if the query is missing.
+    """
+    
+    data = request.get_json()
+    user_id = get_jwt_identity()
+    
+    query = data.get('query')
+
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    
+    c = Chat(user_id = user_id, title = PLACEHOLDER_TITLE)
+    db.session.add(c)
+    db.session.commit()
+    context = ChatContext.new(c)
+
+    start = time.perf_counter()
+    title_future = llm_executor.submit(timed_call, get_title, query)
+
+    def events():
+        stored = []
+        try:
+            yield sse_event('chat', c.to_json(basic=True))
+            
+            answer_start = time.perf_counter()
+            yield from stream_answer(query, context, on_stored=stored.append)
+            answer_time = time.perf_counter() - answer_start
+        
+        finally:
+            # Generation failed or the client went away before the answer was stored
+            if not stored:
+                discard_chat(c, title_future)
+
+        if not stored:
+            return
+        
+        title_time = apply_title(c, title_future)
+        db.session.commit()
+        yield sse_event('title', c.to_json(basic=True))
+
+        log_fanout(c.id, start, title_time, answer_time)
+
+    return sse_response(events())
+
+
+
+@chats_bp.route('/<int:chat_id>/stream', methods=['POST'])
+@jwt_required()
+def llm_chat_stream(chat_id):
+    """
+    Submit a query to an existing chat and stream the answer as Server-Sent Events.
+
+    Expects:
+        JSON body with a 'query' field.
+
+    Events:
+        - token: a chunk of the generated answer.
+        - done: the stored message once the answer is complete.
+        - error: sent instead of 'done' if generation fails.
+
+    Returns:
+        A text/event-stream response, or an error if the chat or query is missing.
+    """
+    
+    context = load_chat_context(chat_id)
+    if context is None:
+        return jsonify(error='Chat not found'), 404
+
+    data = request.get_json()
+    query = data.get('query')
+
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+
+    def events():
+        stored = []
+        try:
+            yield from stream_answer(query, context, on_stored=stored.append)
+        
+        finally:
+            # Update long-term memory in the background if more than 2 messages, once the answer is stored
+            if stored and context.message_count > 3:
+                enqueue_summary(context.chat_id)
+
+    return sse_response(events())
+
+
+
+def validate_questions(questions):
+    """
+    Validates the questions of a batch request.
+
+    Raises:
+        ValueError: If the questions are not a non-empty list of non-empty strings or exceed BATCH_MAX_QUESTIONS.
+    """
+    
+    if not isinstance(questions, list) or not questions or \
+            not all(isinstance(q, str) and q.strip() for q in questions):
+        raise ValueError("Questions must be a non-empty list of non-empty strings")
+
+    if len(questions) > RagConfig.BATCH_MAX_QUESTIONS:
+        raise ValueError(f"At most {RagConfig.BATCH_MAX_QUESTIONS} questions are allowed per batch")
+
+
+def ndjson_lines(questions, concurrency=None):
+    """Yields the batch results as newline-delimited JSON, in completion order."""
+    
+    for result in answer_batch(questions, concurrency):
+        yield json.dumps(result) + "\n"
+
+
+
+@chats_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_chat():
+    """
+    Answer a batch of standalone questions.
+
+    Expects:
+        JSON body with a 'questions' list of strings.
+
+    Process:
+        - Retrieves documents for all questions with one batched embedding call and one FAISS search.
+        - Generates the answers with bounded concurrency at the lowest rate limit priority.
+        - Nothing is stored; no chats are created.
+
+    Returns:
+        An application/x-ndjson response with one line per question as it finishes
+        ({index, question, answer, seconds} or {index, question, error}),
+        or an error if the questions are invalid.
+    """
+    
+    data = request.get_json() or {}
+    questions = data.get('questions')
+
+    try:
+        validate_questions(questions)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return Response(
+        stream_with_context(ndjson_lines(questions)),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+
+@chats_bp.cli.command('batch')
+@click.argument('input_file', type=click.File('r'))
+@click.option('--output', '-o', type=click.File('w'), default='-', help='NDJSON output file (default: stdout).')
+@click.option('--concurrency', '-c', type=int, default=None, help='Answers generated at once.')
+def batch_command(input_file, output, concurrency):
+    """
+    Answer the questions in INPUT_FILE and write NDJSON results.
+
+    INPUT_FILE holds one question per line, or a JSON list of questions.
+    """
+    
+    content = input_file.read()
+    questions = json.loads(content) if content.lstrip().startswith('[') else \
+        [line.strip() for line in content.splitlines() if line.strip()]
+
+    try:
+        validate_questions(questions)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if not pipeline.wait():
+        raise click.ClickException(f"RAG pipeline failed to load: {pipeline.error}")
+
+    for line in ndjson_lines(questions, concurrency):
+        output.write(line)
+        output.flush()
+
+
+
+@chats_bp.cli.command('backfill-message-count')
+def backfill_message_count_command():
+    """Recompute the stored message count of every chat (run once after upgrading)."""
+    
+    click.echo(f"Updated the message count of {backfill_message_counts()} chats.")
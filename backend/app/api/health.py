@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify
+from app.config import RagConfig
+from app.pipeline import pipeline
+
+
+health_bp = Blueprint('health', __name__)
+
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+
+    Returns:
+        JSON with the RAG pipeline state and HTTP 200, whether or not the pipeline is loaded.
+    """
+
+    return jsonify(status='ok', pipeline=pipeline.status()), 200
+
+
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness probe: the RAG pipeline is loaded and chat requests can be answered.
+
+    Also starts the pipeline load if it has not run (or a failed load is due for a retry),
+    so a deployment that only routes traffic once ready also becomes ready with
+    PIPELINE_WARMUP disabled.
+
+    Returns:
+        JSON with the pipeline state and HTTP 200 when ready, otherwise HTTP 503 with a Retry-After header.
+    """
+
+    if pipeline.ready:
+        return jsonify(status='ready', pipeline=pipeline.status()), 200
+
+    pipeline.start()
+
+    response = jsonify(status='not ready', pipeline=pipeline.status())
+    response.headers['Retry-After'] = str(RagConfig.PIPELINE_RETRY_AFTER)
+    return response, 503
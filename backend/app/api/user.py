@@ -2,7 +2,9 @@ from flask import request, jsonify, Blueprint
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
+from app.config import AppConfig
 from app.models import  User
+from app.pagination import page_args
 from app.utils import validate_user
 
 user_bp = Blueprint('user', __name__)
@@ -89,4 +91,32 @@ user_bp.add_url_rule('/register', view_func=user_view, methods=['POST'])
 
 user_bp.add_url_rule('/', view_func=user_view, methods=['GET'])
 
-user_bp.add_url_rule('/update', view_func=user_view, methods=['PUT'])
\ No newline at end of file
+user_bp.add_url_rule('/update', view_func=user_view, methods=['PUT'])
+
+
+
+@user_bp.route('/chats', methods=['GET'])
+@jwt_required()
+def list_chats():
+    """
+    Lists the authenticated user's chats, newest first, one page at a time.
+
+    Query parameters:
+        cursor: The `next_cursor` of the previous page (omit for the first page).
+        limit: Page size (default CHATS_PAGE_SIZE, at most MAX_PAGE_SIZE).
+
+    Returns:
+        JSON with 'chats' and 'next_cursor' (null on the last page), or a 400/404 error.
+    """
+    
+    user = User.query.get(get_jwt_identity())
+    if not user:
+        return jsonify(error="User not found"), 404
+
+    try:
+        cursor, limit = page_args(request.args, AppConfig.CHATS_PAGE_SIZE, AppConfig.MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    page = user.chats_page(cursor, limit)
+    return jsonify(chats=page['chats'], next_cursor=page['chats_next_cursor']), 200
@@ -0,0 +1,191 @@
+import os
+import numpy as np
+from app.embeddings import TOKEN_PATTERN
+from app.log import logger
+
+
+BM25_FILE = 'bm25.npz'
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have how i if in into is it its
+may me might my no not of on or our should so such than that the their them then there these they this
+those to was we were what when where which who whom why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Splits a text into lowercase alphanumeric terms, dropping stopwords."""
+
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def encode_terms(terms):
+    """
+    Packs terms into one UTF-8 byte blob and the offsets of each term in it.
+
+    Returns:
+        A tuple of (blob, offsets), where term i is blob[offsets[i]:offsets[i + 1]].
+    """
+
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype='int64')
+    offsets[1:] = np.cumsum([len(term) for term in encoded])
+
+    return np.frombuffer(b''.join(encoded), dtype='uint8'), offsets
+
+
+def decode_terms(blob, offsets):
+    """Unpacks the terms packed by encode_terms."""
+
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+
+    return [data[start:end].decode('utf-8') for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the chunks of the vector store.
+
+    Postings are stored as flat arrays in CSR layout: the documents and term frequencies
+    of term t are docs[offsets[t]:offsets[t + 1]] and tfs[offsets[t]:offsets[t + 1]].
+    The vocabulary is stored the same way, as one UTF-8 byte blob sliced by term offsets.
+    Document ids are FAISS positions, so sparse and dense results refer to the same chunks.
+    """
+
+    def __init__(self, terms, term_offsets, offsets, docs, tfs, doc_lengths, k1=1.5, b=0.75):
+
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.term_ids = {term: i for i, term in enumerate(decode_terms(terms, term_offsets))}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+        n = len(doc_lengths)
+        df = np.diff(offsets).astype('float32')
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype('float32')
+        self.avg_length = float(doc_lengths.mean()) if n else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @property
+    def vocab_size(self):
+        return len(self.term_offsets) - 1
+
+    @classmethod
+    def build(cls, texts, k1=1.5, b=0.75):
+        """
+        Builds the index from chunk texts in FAISS position order.
+
+        Returns:
+            A BM25Index.
+        """
+
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype='int32')
+
+        for doc, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_lengths[doc] = len(terms)
+
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc, count))
+
+        vocab = sorted(postings)
+        offsets = np.zeros(len(vocab) + 1, dtype='int64')
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocab])
+
+        docs = np.empty(offsets[-1], dtype='int32')
+        tfs = np.empty(offsets[-1], dtype='float32')
+        for i, term in enumerate(vocab):
+            entries = np.array(postings[term], dtype='int64')
+            docs[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            tfs[offsets[i]:offsets[i + 1]] = entries[:, 1]
+
+        return cls(*encode_terms(vocab), offsets, docs, tfs, doc_lengths, k1, b)
+
+    def save(self, directory):
+        """Saves the index arrays to bm25.npz in the given directory."""
+
+        np.savez(os.path.join(directory, BM25_FILE), terms=self.terms, term_offsets=self.term_offsets,
+                 offsets=self.offsets, docs=self.docs, tfs=self.tfs, doc_lengths=self.doc_lengths,
+                 params=np.array([self.k1, self.b], dtype='float32'))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Loads the index saved next to the FAISS index.
+
+        Returns:
+            A BM25Index, or None if the directory has no BM25 index.
+        """
+
+        path = os.path.join(directory, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = data['params'].tolist()
+            if 'terms' in data:
+                terms = data['terms'], data['term_offsets']
+            else:
+                # Indexes saved before the vocabulary was packed store it as a fixed-width string array
+                terms = encode_terms(data['vocab'].tolist())
+            index = cls(*terms, data['offsets'], data['docs'], data['tfs'], data['doc_lengths'], k1, b)
+
+        logger.info(f"BM25 index loaded: {index.vocab_size} terms over {len(index)} chunks")
+        return index
+
+    def query_terms(self, query):
+        """Returns the ids of the query terms present in the vocabulary (unique, in query order)."""
+
+        return list(dict.fromkeys(self.term_ids[t] for t in tokenize(query) if t in self.term_ids))
+
+    def search(self, query, k):
+        """
+        Scores every chunk containing a query term.
+
+        Returns:
+            A list of (position, score) pairs for the top k chunks, best first.
+        """
+
+        scores = np.zeros(len(self), dtype='float32')
+
+        for term in self.query_terms(query):
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs, tfs = self.docs[start:end], self.tfs[start:end]
+
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / (self.avg_length or 1.0))
+            scores[docs] += self.idf[term] * tfs * (self.k1 + 1.0) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(position), float(scores[position])) for position in ranked]
+
+    def is_keyword_query(self, query, max_terms, min_idf):
+        """
+        Returns True for short queries made of rare, indexed terms (drug names, conditions).
+
+        Such queries are answered from the sparse index alone, without embedding them.
+        """
+
+        tokens = TOKEN_PATTERN.findall(query.lower())
+        terms = tokenize(query)
+        if not terms or len(terms) > max_terms or len(terms) < len(tokens) / 2:
+            return False
+
+        if any(t not in self.term_ids for t in terms):
+            return False
+
+        return float(np.mean([self.idf[self.term_ids[t]] for t in terms])) >= min_idf
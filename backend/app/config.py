@@ -2,19 +2,150 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTANCE_DIR = os.path.join(BASE_DIR, 'instance')
+
+
+def database_uri():
+    """Returns the database URI from DATABASE_URL (SQLite in the instance folder by default)."""
+    
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///rag.db')
+    
+    # SQLAlchemy only accepts the postgresql:// scheme
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    
+    return uri
+
+
+def engine_options(uri):
+    """Returns the SQLAlchemy engine options for a database URI (a sized connection pool for servers)."""
+    
+    if uri.startswith('sqlite'):
+        return {}
+    
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
+
 class AppConfig:
     """Base configuration for the Flask app."""
     SECRET_KEY = os.environ.get('SECRET_KEY')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///rag.db'
+    SQLALCHEMY_DATABASE_URI = database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite connections get WAL journaling, synchronous=NORMAL and a busy timeout (ms) so writers wait instead of failing
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
     JWT_COOKIE_SECURE=False
     JWT_TOKEN_LOCATION=["cookies"]
     JWT_SECRET_KEY= os.environ.get('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES=15
     JWT_REFRESH_TOKEN_EXPIRES=12
+    # 'auto' autogenerates and applies migrations on every start (development), 'upgrade' only
+    # applies pending migrations when the DB is behind head (production), 'off' leaves the schema alone
+    MIGRATIONS_MODE = os.environ.get('MIGRATIONS_MODE', 'auto').lower()
+    # Keyset pagination page sizes for chat listings and message history
+    CHATS_PAGE_SIZE = int(os.environ.get('CHATS_PAGE_SIZE', 30))
+    MESSAGES_PAGE_SIZE = int(os.environ.get('MESSAGES_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
     
     
 class RagConfig:
     """Configuration for RAG """ 
     MISTRAL_API_KEY = os.environ.get('MISTRAL_API_KEY')
-    MISTRAL_API_URL = os.environ.get('HF_TOKEN')
\ No newline at end of file
+    MISTRAL_API_URL = os.environ.get('HF_TOKEN')
+    
+    # LLM rate limit shared by all threads and worker processes
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', os.path.join(INSTANCE_DIR, 'rate_limit.db'))
+    RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', 0.25))
+    RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 1))
+    
+    # Thread pools used to fan out retrieval calls, and rate-limited LLM calls (titles, query rewrites)
+    RAG_WORKERS = int(os.environ.get('RAG_WORKERS', 8))
+    LLM_WORKERS = int(os.environ.get('LLM_WORKERS', 8))
+    
+    # Batch question answering: answers generated at once per batch, and maximum questions per request
+    BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 4))
+    BATCH_MAX_QUESTIONS = int(os.environ.get('BATCH_MAX_QUESTIONS', 500))
+    
+    # Load the RAG pipeline in a background thread at startup (otherwise on the first chat request);
+    # chat endpoints answer 503 with this Retry-After until it is ready, and a failed load is retried after it
+    PIPELINE_WARMUP = os.environ.get('PIPELINE_WARMUP', 'true').lower() == 'true'
+    PIPELINE_RETRY_AFTER = int(os.environ.get('PIPELINE_RETRY_AFTER', 5))
+    
+    # Run retrieval, long-term memory lookup and query rewriting concurrently
+    PIPELINED_RETRIEVAL = os.environ.get('PIPELINED_RETRIEVAL', 'true').lower() == 'true'
+    RETRIEVAL_SECOND_PASS = os.environ.get('RETRIEVAL_SECOND_PASS', 'false').lower() == 'true'
+    RETRIEVAL_MAX_DOCS = int(os.environ.get('RETRIEVAL_MAX_DOCS', 5))
+    
+    # 'dense' is MMR over the FAISS index; opt-in 'hybrid' fuses BM25 and FAISS rankings
+    # (falls back to 'dense' when no BM25 index was built)
+    RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'dense').lower()
+    # Dense MMR retrieval: candidates fetched before the diversity selection, and relevance weight (1 = no diversity)
+    MMR_FETCH_K = int(os.environ.get('MMR_FETCH_K', 20))
+    MMR_LAMBDA = float(os.environ.get('MMR_LAMBDA', 0.5))
+    HYBRID_FETCH_K = int(os.environ.get('HYBRID_FETCH_K', 20))
+    HYBRID_RRF_K = int(os.environ.get('HYBRID_RRF_K', 60))
+    # Hybrid mode only, opt-in: queries of at most SPARSE_MAX_TERMS rare terms (mean IDF >= SPARSE_MIN_IDF)
+    # are answered from BM25 alone, skipping the embedding call
+    SPARSE_FAST_PATH = os.environ.get('SPARSE_FAST_PATH', 'false').lower() == 'true'
+    SPARSE_MAX_TERMS = int(os.environ.get('SPARSE_MAX_TERMS', 3))
+    SPARSE_MIN_IDF = float(os.environ.get('SPARSE_MIN_IDF', 4.0))
+    
+    # Background long-term summary jobs
+    SUMMARY_WORKERS = int(os.environ.get('SUMMARY_WORKERS', 1))
+    SUMMARY_POLL_INTERVAL = float(os.environ.get('SUMMARY_POLL_INTERVAL', 2.0))
+    SUMMARY_MAX_ATTEMPTS = int(os.environ.get('SUMMARY_MAX_ATTEMPTS', 3))
+    SUMMARY_STALE_AFTER = float(os.environ.get('SUMMARY_STALE_AFTER', 600))
+    
+    # Embedding-similarity gate in front of the LLM summary relevance check:
+    # similarity >= COVERED means already in the summary ("No"), <= NEW_TOPIC means a new topic ("Yes")
+    SUMMARY_GATE_ENABLED = os.environ.get('SUMMARY_GATE_ENABLED', 'true').lower() == 'true'
+    SUMMARY_GATE_COVERED = float(os.environ.get('SUMMARY_GATE_COVERED', 0.9))
+    SUMMARY_GATE_NEW_TOPIC = float(os.environ.get('SUMMARY_GATE_NEW_TOPIC', 0.6))
+    
+    # Embedding provider: 'mistral' (API), 'hashing' (local feature hashing) or 'onnx' (local model)
+    EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'mistral').lower()
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'mistral-embed')
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 64))
+    HASHING_EMBEDDING_DIM = int(os.environ.get('HASHING_EMBEDDING_DIM', 1024))
+    ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', os.path.join(INSTANCE_DIR, 'onnx-embedder'))
+    
+    # Query embedding cache (in-process LRU backed by SQLite)
+    EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', os.path.join(INSTANCE_DIR, 'embedding_cache.db'))
+    EMBEDDING_CACHE_MEMORY_SIZE = int(os.environ.get('EMBEDDING_CACHE_MEMORY_SIZE', 2048))
+    EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get('EMBEDDING_CACHE_MAX_ROWS', 100000))
+    EMBEDDING_CACHE_TTL = float(os.environ.get('EMBEDDING_CACHE_TTL', 30 * 24 * 3600))
+    
+    # Opt-in semantic answer cache for first questions without memory context
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+    SEMANTIC_CACHE_PATH = os.environ.get('SEMANTIC_CACHE_PATH', os.path.join(INSTANCE_DIR, 'semantic_cache.db'))
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get('SEMANTIC_CACHE_MAX_ENTRIES', 50000))
+    
+    # FAISS index type ('flat' exact search, 'hnsw' or 'ivf') and its build / search parameters
+    INDEX_TYPE = os.environ.get('INDEX_TYPE', 'flat').lower()
+    HNSW_M = int(os.environ.get('HNSW_M', 32))
+    HNSW_EF_CONSTRUCTION = int(os.environ.get('HNSW_EF_CONSTRUCTION', 200))
+    HNSW_EF_SEARCH = int(os.environ.get('HNSW_EF_SEARCH', 64))
+    IVF_NLIST = int(os.environ.get('IVF_NLIST', 0))
+    IVF_NPROBE = int(os.environ.get('IVF_NPROBE', 16))
+    RECALL_K = int(os.environ.get('RECALL_K', 10))
+    RECALL_QUERIES = int(os.environ.get('RECALL_QUERIES', 200))
+    
+    # Prompt token budgets per section (see "Token Limits" in the README) and for the whole prompt;
+    # counted with a local tiktoken encoding, or ~4 characters per token when it is unavailable
+    PROMPT_TOKENIZER = os.environ.get('PROMPT_TOKENIZER', 'cl100k_base')
+    PROMPT_QUERY_TOKENS = int(os.environ.get('PROMPT_QUERY_TOKENS', 900))
+    PROMPT_SHORT_TERM_TOKENS = int(os.environ.get('PROMPT_SHORT_TERM_TOKENS', 6450))
+    PROMPT_LONG_TERM_TOKENS = int(os.environ.get('PROMPT_LONG_TERM_TOKENS', 1500))
+    PROMPT_CHUNK_TOKENS = int(os.environ.get('PROMPT_CHUNK_TOKENS', 2500))
+    PROMPT_MAX_TOKENS = int(os.environ.get('PROMPT_MAX_TOKENS', 11350))
@@ -0,0 +1,151 @@
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import Chat, LongTermMemory, ShortTermMemory
+
+
+RECENT_TURNS = 3
+
+
+class ChatContext:
+    """
+    Conversation state used to answer or summarize one turn of a chat.
+
+    Loaded once per request by `load_chat_context` and passed through the RAG pipeline,
+    so the history is not re-queried by every step.
+    """
+
+    def __init__(self, chat, recent_messages, long_term_memory, message_count):
+        """
+        Args:
+            chat: The Chat row.
+            recent_messages: The last ShortTermMemory rows, oldest first.
+            long_term_memory: The LongTermMemory row, or None.
+            message_count: Number of messages stored for the chat.
+        """
+
+        self.chat = chat
+        self.recent_messages = recent_messages
+        self.long_term_memory = long_term_memory
+        # A count that predates the stored counter is never lower than what was just loaded
+        self.message_count = max(message_count, len(recent_messages))
+
+    @classmethod
+    def new(cls, chat):
+        """Returns the context of a chat that has just been created."""
+
+        return cls(chat, [], None, 0)
+
+    @property
+    def chat_id(self):
+        return self.chat.id
+
+    @property
+    def has_history(self):
+        return self.message_count > 0
+
+    @property
+    def summary(self):
+        return self.long_term_memory.summary if self.long_term_memory else None
+
+    def all_messages(self):
+        """Loads the complete message history, oldest first (only needed for a first summary)."""
+
+        return ShortTermMemory.query.filter_by(chat_id=self.chat_id).order_by(ShortTermMemory.id).all()
+
+    def messages_after(self, message_id):
+        """Loads the messages stored after `message_id`, oldest first (the turns not yet summarized)."""
+
+        return ShortTermMemory.query.filter(ShortTermMemory.chat_id == self.chat_id, ShortTermMemory.id > message_id) \
+            .order_by(ShortTermMemory.id).all()
+
+
+def load_chat_context(chat_id, turns=RECENT_TURNS):
+    """
+    Loads a chat, its last `turns` messages and its summary in a single SQL round trip.
+
+    The recent messages come from an `ORDER BY id DESC LIMIT turns` subquery outer-joined
+    to the chat together with its long-term memory, so the history is never loaded in full.
+
+    Args:
+        chat_id: The chat id.
+        turns: Number of recent messages to load.
+
+    Returns:
+        A ChatContext, or None if the chat does not exist.
+    """
+
+    recent = select(ShortTermMemory).where(ShortTermMemory.chat_id == chat_id) \
+        .order_by(ShortTermMemory.id.desc()).limit(turns).subquery()
+    message = aliased(ShortTermMemory, recent)
+
+    rows = db.session.execute(
+        select(Chat, LongTermMemory, message)
+        .outerjoin(LongTermMemory, LongTermMemory.chat_id == Chat.id)
+        .outerjoin(message, message.chat_id == Chat.id)
+        .where(Chat.id == chat_id)
+    ).all()
+
+    if not rows:
+        return None
+
+    chat, long_term_memory = rows[0][0], rows[0][1]
+    messages = {m.id: m for _, _, m in rows if m is not None}
+
+    return ChatContext(chat, [messages[i] for i in sorted(messages)], long_term_memory, chat.message_count)
+
+
+def add_message(context, question, answer):
+    """
+    Stores a question / answer turn and increments the chat's stored message count.
+
+    The count is incremented in SQL (`message_count = message_count + 1`) in the same
+    transaction, so concurrent turns cannot lose updates.
+
+    Returns:
+        The new ShortTermMemory row.
+    """
+
+    message = ShortTermMemory(chat_id=context.chat_id, question=question, answer=answer)
+    db.session.add(message)
+    db.session.execute(
+        update(Chat).where(Chat.id == context.chat_id).values(message_count=Chat.message_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    context.message_count += 1
+    context.recent_messages = (context.recent_messages + [message])[-RECENT_TURNS:]
+
+    return message
+
+
+def backfill_message_counts():
+    """
+    Recomputes the stored message count of every chat from its messages.
+
+    Returns:
+        The number of chats updated.
+    """
+
+    count = select(func.count(ShortTermMemory.id)).where(ShortTermMemory.chat_id == Chat.id).scalar_subquery()
+    result = db.session.execute(
+        update(Chat).values(message_count=count).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return result.rowcount
+
+
+def message_counts_stale():
+    """
+    Tells whether some chat has messages but a zero message count.
+
+    That only happens for chats created before the counter column was added, since
+    `add_message` increments it in the same transaction as the insert.
+    """
+
+    has_messages = exists().where(ShortTermMemory.chat_id == Chat.id)
+    return db.session.execute(
+        select(Chat.id).where(Chat.message_count == 0, has_messages).limit(1)
+    ).first() is not None
@@ -0,0 +1,207 @@
+import json
+import mmap
+import os
+import zlib
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from app.bm25 import BM25Index
+from app.log import logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+INDEX_FILE = 'index.faiss'
+LEGACY_DOCSTORE_FILE = 'index.pkl'
+CHUNKS_FILE = 'chunks.bin'
+OFFSETS_FILE = 'chunks.offsets.npy'
+DOCSTORE_META_FILE = 'docstore.json'
+
+
+def compressor(codec):
+    """Returns the (compress, decompress) functions of a codec ('zstd' or 'zlib')."""
+
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("The chunk store is zstd-compressed but the 'zstandard' package is not installed.")
+        return zstandard.ZstdCompressor(level=3).compress, lambda data: zstandard.ZstdDecompressor().decompress(data)
+
+    if codec == 'zlib':
+        return zlib.compress, zlib.decompress
+
+    raise ValueError(f"Unknown chunk store codec '{codec}'.")
+
+
+class PositionalIds:
+    """Maps a FAISS position to itself, standing in for the `index_to_docstore_id` dict."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, position):
+        position = int(position)
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return position
+
+    def __len__(self):
+        return self.size
+
+
+class MmapDocstore(Docstore):
+    """
+    Read-only chunk store backed by a memory-mapped file.
+
+    Chunk i (the vector at FAISS position i) is stored as one compressed JSON record
+    between offsets[i] and offsets[i + 1]. Records are only decoded when a search
+    returns them, and the pages of the mapping are shared by every worker process.
+
+    The store cannot add or delete chunks, so neither can a vector store opened on it.
+    To change the chunks, open the vector store with `lazy=False` (an in-memory docstore)
+    and save it again with `save_vector_store`.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directory holding the chunk store files.
+        """
+
+        with open(os.path.join(directory, DOCSTORE_META_FILE)) as f:
+            meta = json.load(f)
+
+        _, self.decompress = compressor(meta['codec'])
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode='r')
+
+        with open(os.path.join(directory, CHUNKS_FILE), 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta['count'] else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record(self, position):
+        """Decodes the raw record stored at a position."""
+
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self.decompress(self.data[start:end]))
+
+    def search(self, search):
+        """Returns the Document stored at a FAISS position (the Docstore interface)."""
+
+        position = int(search)
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."
+
+        record = self.record(position)
+        return Document(id=record['id'], page_content=record['text'], metadata=record['metadata'])
+
+
+def write_docstore(directory, vector_store, codec=None):
+    """
+    Writes the chunks of a vector store in FAISS position order.
+
+    Args:
+        directory: Target directory.
+        vector_store: A FAISS vector store with an in-memory docstore.
+        codec: 'zstd' or 'zlib'. Defaults to zstd when the package is installed.
+    """
+
+    codec = codec or ('zstd' if zstandard is not None else 'zlib')
+    compress, _ = compressor(codec)
+
+    count = vector_store.index.ntotal
+    offsets = np.zeros(count + 1, dtype='int64')
+
+    with open(os.path.join(directory, CHUNKS_FILE), 'wb') as f:
+        for position in range(count):
+            doc_id = vector_store.index_to_docstore_id[position]
+            doc = vector_store.docstore.search(doc_id)
+            record = {'id': doc_id, 'text': doc.page_content, 'metadata': doc.metadata}
+
+            f.write(compress(json.dumps(record, ensure_ascii=False).encode('utf-8')))
+            offsets[position + 1] = f.tell()
+
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+
+    with open(os.path.join(directory, DOCSTORE_META_FILE), 'w') as f:
+        json.dump({'codec': codec, 'count': count}, f)
+
+
+def save_vector_store(vector_store, directory):
+    """
+    Saves a vector store as a FAISS index, a memory-mappable chunk store and a BM25 index.
+
+    Replaces `FAISS.save_local`; a legacy pickled docstore left in the directory is removed.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    faiss.write_index(vector_store.index, os.path.join(directory, INDEX_FILE))
+    write_docstore(directory, vector_store)
+
+    texts = [vector_store.docstore.search(vector_store.index_to_docstore_id[position]).page_content
+             for position in range(vector_store.index.ntotal)]
+    bm25 = BM25Index.build(texts)
+    bm25.save(directory)
+    logger.info(f"BM25 index built: {bm25.vocab_size} terms over {len(bm25)} chunks")
+
+    legacy_path = os.path.join(directory, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def has_chunk_store(directory):
+    """Returns True if the directory holds an index saved by `save_vector_store`."""
+
+    return all(os.path.exists(os.path.join(directory, name))
+               for name in (INDEX_FILE, CHUNKS_FILE, OFFSETS_FILE, DOCSTORE_META_FILE))
+
+
+def has_legacy_store(directory):
+    """Returns True if the directory holds an index saved by `FAISS.save_local`."""
+
+    return all(os.path.exists(os.path.join(directory, name)) for name in (INDEX_FILE, LEGACY_DOCSTORE_FILE))
+
+
+def open_vector_store(directory, embedding_model, lazy=True):
+    """
+    Opens a vector store saved by `save_vector_store` (or a legacy `FAISS.save_local` one).
+
+    Args:
+        directory: Directory holding the index and chunk store.
+        embedding_model: The embeddings model used to embed queries.
+        lazy: Keep chunks on disk and decode only search results. Pass False to load every
+            chunk into an in-memory docstore, which supports adding and deleting chunks.
+
+    Returns:
+        A FAISS vector store.
+    """
+
+    if not has_chunk_store(directory) and has_legacy_store(directory):
+        logger.warning(f"⚠️ Loading pickled docstore from '{directory}', rebuild the vector store to use the chunk store.")
+        return FAISS.load_local(directory, embedding_model, allow_dangerous_deserialization=True)
+
+    index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+    docstore = MmapDocstore(directory)
+
+    if len(docstore) != index.ntotal:
+        raise RuntimeError(f"Chunk store holds {len(docstore)} chunks but the index holds {index.ntotal} vectors. "
+                           f"Please rebuild the vector store.")
+
+    if lazy:
+        return FAISS(embedding_model, index, docstore, PositionalIds(index.ntotal))
+
+    documents = {}
+    index_to_id = {}
+    for position in range(len(docstore)):
+        doc = docstore.search(position)
+        documents[doc.id] = doc
+        index_to_id[position] = doc.id
+
+    logger.info(f"Loaded {len(documents)} chunks into memory from '{directory}'")
+    return FAISS(embedding_model, index, InMemoryDocstore(documents), index_to_id)
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from app.log import logger
+
+
+def normalize_query(text):
+    """Normalizes query text for cache lookups (collapsed whitespace, case-folded)."""
+
+    return " ".join(text.split()).casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Query-embedding cache in front of another LangChain embeddings model.
+
+    Lookups go through an in-process LRU first and then an on-disk SQLite store shared
+    by all workers. Keys are the normalized query text plus the model name. Entries are
+    evicted by count (memory and disk) and by age (TTL). Document embeddings are passed
+    through uncached.
+    """
+
+    def __init__(self, embeddings, model_name, path, memory_size=2048, max_rows=100000, ttl=30 * 24 * 3600):
+        """
+        Args:
+            embeddings: The underlying embeddings model.
+            model_name: Name of the underlying model, part of every cache key.
+            path: Path of the SQLite cache file.
+            memory_size: Maximum number of entries kept in the in-process LRU.
+            max_rows: Maximum number of entries kept on disk.
+            ttl: Time to live of an entry in seconds.
+        """
+
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        self.writes = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_embedding (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_query_embedding_accessed ON query_embedding (accessed_at)")
+
+    def cache_key(self, text):
+        """Returns the cache key for a query under this model."""
+
+        return hashlib.sha256(f"{self.model_name}\0{normalize_query(text)}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Looks a key up in memory, then on disk. Returns the vector or None."""
+
+        now = time.time()
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                vector, created_at = entry
+                if now - created_at <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.hits['memory'] += 1
+                    return vector
+                del self.memory[key]
+
+            row = self.conn.execute(
+                "SELECT vector, created_at FROM query_embedding WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE query_embedding SET accessed_at = ? WHERE key = ?", (now, key))
+            vector = array('f', row[0]).tolist()
+            self.remember(key, vector, row[1])
+            self.hits['disk'] += 1
+            return vector
+
+    def put(self, key, vector):
+        """Stores a vector in memory and on disk, evicting the oldest disk entries when full."""
+
+        now = time.time()
+
+        with self.lock:
+            self.remember(key, vector, now)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO query_embedding (key, model, vector, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, self.model_name, array('f', vector).tobytes(), now, now)
+            )
+            self.writes += 1
+
+            if self.writes % 100 == 0:
+                self.evict(now)
+
+    def remember(self, key, vector, created_at):
+        """Adds an entry to the in-process LRU (caller holds the lock)."""
+
+        self.memory[key] = (vector, created_at)
+        self.memory.move_to_end(key)
+
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def evict(self, now=None):
+        """Deletes expired disk entries and trims the store to max_rows by last access."""
+
+        now = now or time.time()
+
+        self.conn.execute("DELETE FROM query_embedding WHERE created_at < ?", (now - self.ttl,))
+        self.conn.execute("""
+            DELETE FROM query_embedding WHERE key IN (
+                SELECT key FROM query_embedding ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_rows,))
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            A dict with memory/disk hits, misses, hit rate and current sizes.
+        """
+
+        with self.lock:
+            hits = self.hits['memory'] + self.hits['disk']
+            total = hits + self.misses
+            disk_rows = self.conn.execute("SELECT COUNT(*) FROM query_embedding").fetchone()[0]
+
+            return {
+                'model': self.model_name,
+                'memory_hits': self.hits['memory'],
+                'disk_hits': self.hits['disk'],
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': disk_rows
+            }
+
+    def embed_query(self, text):
+        """Embeds a query, serving it from the cache when possible."""
+
+        key = self.cache_key(text)
+        vector = self.get(key)
+
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.put(key, vector)
+
+            if self.misses % 100 == 0:
+                logger.info(f"Query embedding cache stats: {self.stats()}")
+
+        return vector
+
+    def embed_documents(self, texts):
+        """Embeds documents with the underlying model (not cached)."""
+
+        return self.embeddings.embed_documents(texts)
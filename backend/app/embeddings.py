@@ -0,0 +1,299 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_mistralai import MistralAIEmbeddings
+from app.config import RagConfig
+from app.log import logger
+
+
+EMBEDDING_META_FILE = 'embedding_meta.json'
+
+# Indexes built before the metadata file existed were always built with mistral-embed
+LEGACY_EMBEDDING_META = {'provider': 'mistral', 'model': 'mistral-embed', 'dimension': 1024}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    CPU-local embeddings using signed feature hashing of word unigrams and bigrams.
+
+    Each term is hashed into one of `dimension` buckets with a hash-derived sign, weighted
+    by sublinear term frequency, and every vector is L2-normalized. It needs no model files
+    or network access, which makes it suitable for offline index builds and tests.
+    """
+
+    def __init__(self, dimension=1024, batch_size=256):
+        """
+        Args:
+            dimension: Size of the output vectors.
+            batch_size: Number of texts embedded per NumPy batch.
+        """
+
+        self.dimension = dimension
+        self.batch_size = batch_size
+
+    def terms(self, text):
+        """Returns the unigrams and bigrams of a text."""
+
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed_batch(self, texts):
+        """Embeds a batch of texts into a normalized (len(texts), dimension) matrix."""
+
+        matrix = np.zeros((len(texts), self.dimension), dtype='float32')
+
+        for row, text in enumerate(texts):
+            counts = {}
+            for term in self.terms(text):
+                counts[term] = counts.get(term, 0) + 1
+
+            if not counts:
+                continue
+
+            hashes = np.array(
+                [int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'little') for t in counts],
+                dtype='uint64'
+            )
+            buckets = (hashes % np.uint64(self.dimension)).astype('int64')
+            signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0).astype('float32')
+            weights = 1.0 + np.log(np.fromiter(counts.values(), dtype='float32'))
+
+            np.add.at(matrix[row], buckets, signs * weights)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts):
+        """Embeds a list of documents."""
+
+        vectors = [self.embed_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        """Embeds a single query."""
+
+        return self.embed_batch([text])[0].tolist()
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    CPU-local sentence embeddings from an ONNX transformer model loaded from disk.
+
+    The model directory must contain `model.onnx` and a HuggingFace `tokenizer.json`.
+    Token embeddings are mean-pooled over the attention mask and L2-normalized.
+    """
+
+    def __init__(self, model_dir, batch_size=32, max_length=512):
+        """
+        Args:
+            model_dir: Directory containing model.onnx and tokenizer.json.
+            batch_size: Number of texts per inference batch.
+            max_length: Maximum number of tokens per text.
+        """
+
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("The 'onnx' embedding provider requires the onnxruntime package.") from e
+
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, 'model.onnx')
+        tokenizer_path = os.path.join(model_dir, 'tokenizer.json')
+
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX embedding model file '{path}' does not exist.")
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def embed_batch(self, texts):
+        """Embeds a batch of texts into a normalized matrix."""
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype='int64')
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype='int64')
+
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            inputs['token_type_ids'] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = attention_mask[..., None].astype('float32')
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (pooled / norms).astype('float32')
+
+    def embed_documents(self, texts):
+        """Embeds a list of documents."""
+
+        vectors = [self.embed_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        """Embeds a single query."""
+
+        return self.embed_batch([text])[0].tolist()
+
+
+@functools.lru_cache(maxsize=16)
+def file_digest(path, size, mtime):
+    """Returns the SHA-256 of a file (cached per path, size and modification time)."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def onnx_model_id(model_dir):
+    """
+    Identifies an ONNX embedding model by its files rather than its directory name.
+
+    Returns:
+        '<directory name>@<hash of model.onnx and tokenizer.json>', or the directory
+        name alone if the files are missing (the provider then fails to load anyway).
+    """
+
+    name = os.path.basename(os.path.normpath(model_dir))
+    digest = hashlib.sha256()
+
+    for filename in ('model.onnx', 'tokenizer.json'):
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            return name
+        stat = os.stat(path)
+        digest.update(file_digest(path, stat.st_size, stat.st_mtime_ns).encode('ascii'))
+
+    return f"{name}@{digest.hexdigest()[:16]}"
+
+
+def embedding_signature():
+    """
+    Describes the configured embedding provider.
+
+    Returns:
+        A dict with the provider name, model name and, when known up front, the vector dimension.
+    """
+
+    provider = RagConfig.EMBEDDING_PROVIDER
+
+    if provider == 'mistral':
+        return {'provider': 'mistral', 'model': RagConfig.EMBEDDING_MODEL, 'dimension': 1024}
+    if provider == 'hashing':
+        return {'provider': 'hashing', 'model': 'hashing-uni-bigram', 'dimension': RagConfig.HASHING_EMBEDDING_DIM}
+    if provider == 'onnx':
+        return {'provider': 'onnx', 'model': onnx_model_id(RagConfig.ONNX_MODEL_DIR), 'dimension': None}
+
+    raise ValueError(f"Unknown embedding provider '{provider}'. Expected one of: mistral, hashing, onnx.")
+
+
+def get_embedding_model():
+    """
+    Builds the embedding model selected by RagConfig.EMBEDDING_PROVIDER.
+
+    Returns:
+        A LangChain Embeddings instance.
+    """
+
+    signature = embedding_signature()
+    provider = signature['provider']
+    logger.info(f"Loading '{provider}' embeddings model ({signature['model']})...")
+
+    if provider == 'mistral':
+        return MistralAIEmbeddings(
+            model=RagConfig.EMBEDDING_MODEL,
+            api_key=RagConfig.MISTRAL_API_KEY,
+            wait_time=2
+        )
+    if provider == 'hashing':
+        return HashingEmbeddings(dimension=RagConfig.HASHING_EMBEDDING_DIM, batch_size=RagConfig.EMBEDDING_BATCH_SIZE)
+
+    return OnnxEmbeddings(RagConfig.ONNX_MODEL_DIR, batch_size=RagConfig.EMBEDDING_BATCH_SIZE)
+
+
+def embedding_model_name():
+    """
+    Returns an identifier of the configured embeddings, used in cache keys.
+
+    'provider:model', plus ':<dimension>' for providers with a configurable dimension
+    (hashing). The onnx model name includes a hash of the model files, and the Mistral
+    model name alone fixes its dimension, which keeps existing Mistral caches valid.
+    """
+
+    signature = embedding_signature()
+    name = f"{signature['provider']}:{signature['model']}"
+
+    if signature['provider'] == 'hashing':
+        name += f":{signature['dimension']}"
+
+    return name
+
+
+def write_embedding_meta(directory, dimension):
+    """
+    Records which embedding provider and dimension an index was built with.
+
+    Args:
+        directory: The index directory.
+        dimension: The dimension of the stored vectors.
+    """
+
+    meta = dict(embedding_signature(), dimension=int(dimension))
+
+    with open(os.path.join(directory, EMBEDDING_META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def check_embedding_meta(directory, dimension):
+    """
+    Refuses to use an index built with a different embedding provider or dimension.
+
+    Args:
+        directory: The index directory.
+        dimension: The dimension of the loaded index.
+
+    Raises:
+        RuntimeError: If the index does not match the configured embedding provider.
+    """
+
+    meta_path = os.path.join(directory, EMBEDDING_META_FILE)
+    meta = LEGACY_EMBEDDING_META
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    expected = embedding_signature()
+    problems = []
+
+    if (meta.get('provider'), meta.get('model')) != (expected['provider'], expected['model']):
+        problems.append(f"built with {meta.get('provider')}:{meta.get('model')}, "
+                        f"configured {expected['provider']}:{expected['model']}")
+    if meta.get('dimension') is not None and int(meta['dimension']) != int(dimension):
+        problems.append(f"metadata dimension {meta['dimension']} does not match index dimension {dimension}")
+    if expected['dimension'] is not None and int(expected['dimension']) != int(dimension):
+        problems.append(f"configured dimension {expected['dimension']} does not match index dimension {dimension}")
+
+    if problems:
+        error_msg = f"❌ Vector store in '{directory}' is incompatible with the embedding provider: {'; '.join(problems)}"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
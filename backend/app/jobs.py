@@ -0,0 +1,212 @@
+import threading
+import time
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import RagConfig
+from app.context import load_chat_context
+from app.models import SummaryJob
+from app.pipeline import pipeline
+from app.rag import generate_summary
+from app.log import logger
+
+
+wakeup = threading.Event()
+workers = []
+workers_lock = threading.Lock()
+
+
+def enqueue_summary(chat_id):
+    """
+    Queues a long-term summary update for a chat.
+
+    Only one job exists per chat. If a job is already pending the request is coalesced
+    into it; if it is currently running it is flagged to run once more when it finishes,
+    so the summary always catches up with the latest turn.
+
+    Args:
+        chat_id: The id of the chat whose summary should be updated.
+    """
+
+    now = time.time()
+
+    for _ in range(2):
+        updated = SummaryJob.query.filter_by(chat_id=chat_id).update({
+            SummaryJob.coalesced: SummaryJob.coalesced + 1,
+            SummaryJob.rerun: case((SummaryJob.status == 'running', True), else_=SummaryJob.rerun),
+            SummaryJob.updated_at: now
+        }, synchronize_session=False)
+
+        if updated:
+            db.session.commit()
+            break
+
+        try:
+            db.session.add(SummaryJob(chat_id=chat_id, available_at=now))
+            db.session.commit()
+            break
+
+        except IntegrityError:
+            # Another worker or process inserted the job first, coalesce into it.
+            db.session.rollback()
+
+    wakeup.set()
+
+
+def claim_next_job():
+    """
+    Atomically claims the oldest runnable summary job.
+
+    Jobs left in 'running' by a crashed worker are released after SUMMARY_STALE_AFTER seconds.
+
+    Returns:
+        The claimed SummaryJob, or None if there is nothing to do.
+    """
+
+    now = time.time()
+
+    SummaryJob.query.filter(
+        SummaryJob.status == 'running',
+        SummaryJob.updated_at < now - RagConfig.SUMMARY_STALE_AFTER
+    ).update({SummaryJob.status: 'pending'}, synchronize_session=False)
+    db.session.commit()
+
+    candidates = SummaryJob.query.filter(
+        SummaryJob.status == 'pending',
+        SummaryJob.available_at <= now
+    ).order_by(SummaryJob.available_at).limit(5).all()
+
+    for job in candidates:
+        claimed = SummaryJob.query.filter_by(id=job.id, status='pending').update({
+            SummaryJob.status: 'running',
+            SummaryJob.rerun: False,
+            SummaryJob.attempts: SummaryJob.attempts + 1,
+            SummaryJob.updated_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            db.session.refresh(job)
+            return job
+
+    return None
+
+
+def finish_job(job):
+    """Removes a completed job, or puts it back in the queue if new turns arrived meanwhile."""
+
+    deleted = SummaryJob.query.filter_by(id=job.id, rerun=False).delete(synchronize_session=False)
+
+    if not deleted:
+        SummaryJob.query.filter_by(id=job.id).update({
+            SummaryJob.status: 'pending',
+            SummaryJob.rerun: False,
+            SummaryJob.attempts: 0,
+            SummaryJob.available_at: time.time()
+        }, synchronize_session=False)
+
+    db.session.commit()
+
+
+def fail_job(job, error):
+    """Reschedules a failed job with backoff, or drops it after SUMMARY_MAX_ATTEMPTS."""
+
+    db.session.rollback()
+
+    if job.attempts >= RagConfig.SUMMARY_MAX_ATTEMPTS:
+        logger.error(f"❌ Dropping summary job for chat {job.chat_id} after {job.attempts} attempts: {error}")
+        SummaryJob.query.filter_by(id=job.id).delete(synchronize_session=False)
+
+    else:
+        delay = (2 ** job.attempts) * RagConfig.SUMMARY_POLL_INTERVAL
+        logger.warning(f"Summary job for chat {job.chat_id} failed, retrying in {delay:.0f}s: {error}")
+        SummaryJob.query.filter_by(id=job.id).update({
+            SummaryJob.status: 'pending',
+            SummaryJob.available_at: time.time() + delay
+        }, synchronize_session=False)
+
+    db.session.commit()
+
+
+def run_next_job():
+    """
+    Claims and runs a single summary job.
+
+    Returns:
+        True if a job was processed, False if the queue was empty.
+    """
+
+    job = claim_next_job()
+    if job is None:
+        return False
+
+    context = load_chat_context(job.chat_id)
+    if context is None:
+        SummaryJob.query.filter_by(id=job.id).delete(synchronize_session=False)
+        db.session.commit()
+        return True
+
+    # The row is deleted by finish_job, read what is logged beforehand
+    chat_id, coalesced = job.chat_id, job.coalesced
+
+    start = time.perf_counter()
+    try:
+        generate_summary(context)
+        finish_job(job)
+        logger.info(f"Summary for chat {chat_id} updated in {time.perf_counter() - start:.2f}s "
+                    f"({coalesced} coalesced requests)")
+
+    except Exception as e:
+        fail_job(job, e)
+
+    return True
+
+
+class SummaryWorker(threading.Thread):
+    """Daemon thread that drains the summary job queue inside an app context."""
+
+    def __init__(self, app, name):
+
+        super().__init__(name=name, daemon=True)
+        self.app = app
+
+    def run(self):
+
+        while not pipeline.wait():
+            time.sleep(RagConfig.PIPELINE_RETRY_AFTER)
+
+        while True:
+            processed = False
+            try:
+                with self.app.app_context():
+                    processed = run_next_job()
+
+            except Exception as e:
+                logger.error(f"❌ Summary worker error: {e}", exc_info=True)
+
+            if not processed:
+                wakeup.wait(RagConfig.SUMMARY_POLL_INTERVAL)
+                wakeup.clear()
+
+
+def start_workers(app):
+    """
+    Starts the summary worker threads for this process (idempotent).
+
+    Args:
+        app: The Flask application the workers should run against.
+    """
+
+    if workers:
+        return
+
+    with workers_lock:
+        if workers:
+            return
+
+        for i in range(RagConfig.SUMMARY_WORKERS):
+            worker = SummaryWorker(app, name=f"summary-worker-{i}")
+            worker.start()
+            workers.append(worker)
+
+        logger.info(f"Started {len(workers)} summary worker thread(s).")
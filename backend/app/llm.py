@@ -1,20 +1,22 @@
 from langchain_mistralai import ChatMistralAI
-from langchain_core.rate_limiters import InMemoryRateLimiter
 import time
-from langchain_mistralai import MistralAIEmbeddings
 from app.config import RagConfig
-from app.vector_store import load_vector_store
+from app.embedding_cache import CachedEmbeddings
+from app.embeddings import embedding_model_name, get_embedding_model
+from app.rate_limit import Priority, SharedRateLimiter, retry_after_seconds, status_code
+from app.retrievers import HybridRetriever, MMRRetriever
+from app.vector_store import load_bm25_index, load_vector_store
 from app.log import logger
 
 class RagLLM(ChatMistralAI):
     """A custom LLM class for Mistral AI with rate limiting and retry logic."""
 
     def __init__(self, *args, **kwargs):
-        """Initialize the RagLLM with custom rate limiting and retry logic."""
-        from langchain_core.rate_limiters import InMemoryRateLimiter
-        rate_limiter = InMemoryRateLimiter(
-            requests_per_second=0.25,
-            max_bucket_size=1,
+        """Initialize the RagLLM with a rate limiter shared across workers and retry logic."""
+        rate_limiter = SharedRateLimiter(
+            path=RagConfig.RATE_LIMIT_PATH,
+            requests_per_second=RagConfig.RATE_LIMIT_RPS,
+            max_bucket_size=RagConfig.RATE_LIMIT_BURST,
             check_every_n_seconds=0.3
         )
 
@@ -26,41 +28,121 @@ class RagLLM(ChatMistralAI):
             max_tokens=1250
         )
 
-    def invoke(self, prompt):
+    def backoff(self, error, attempt):
+        """
+        Handles a failed attempt before retrying.
+
+        On a 429 the shared limiter is paused for the provider's Retry-After (or an
+        exponential delay if the header is missing), so every worker backs off together
+        and the next acquire waits for it. Other errors sleep with exponential backoff.
+        """
+        wait_time = (2 ** (attempt+1)) * 0.5
+
+        if status_code(error) == 429:
+            retry_after = retry_after_seconds(error)
+            self.rate_limiter.block_for(retry_after if retry_after is not None else wait_time)
+            logger.warning(f"LLM rate limited (attempt {attempt + 1}), retry after "
+                           f"{retry_after if retry_after is not None else wait_time:.1f}s")
+            return
+
+        time.sleep(wait_time)
+
+    def invoke(self, prompt, priority=Priority.ANSWER):
         """
         Invoke the LLM with retry logic for rate limits.
         
         Retries with exponential backoff if rate limits are hit.
+
+        Args:
+            prompt: The prompt to send.
+            priority: The rate limiter priority class of this call.
         """
         for attempt in range(10):
             try:
-                return super().invoke(prompt)
+                with self.rate_limiter.priority(priority):
+                    return super().invoke(prompt)
             except Exception as e:
-                wait_time = (2 ** (attempt+1)) * 0.5
-                
-                time.sleep(wait_time)
+                self.backoff(e, attempt)
         
         error_msg = f"❌ Failed to invoke LLM after multiple retries. Please check your LLM subscription for more details."        
         logger.error(error_msg, exc_info=True)
         
         raise RuntimeError(error_msg)
 
+    def stream(self, prompt, priority=Priority.ANSWER):
+        """
+        Stream the LLM completion chunk by chunk with the same retry logic as `invoke`.
 
+        Retries with exponential backoff only until the first chunk has been received;
+        once tokens have been yielded to the caller a failure cannot be replayed and is raised.
+        The priority only applies while the first chunk is requested (when the limiter token
+        is taken), so it does not leak to other code run on this thread between chunks.
 
-def create_retriever(vs):
+        Args:
+            prompt: The prompt to send.
+            priority: The rate limiter priority class of this call.
+        """
+        for attempt in range(10):
+            started = False
+            try:
+                chunks = super().stream(prompt)
+                with self.rate_limiter.priority(priority):
+                    first = next(chunks, None)
+
+                if first is None:
+                    return
+
+                started = True
+                yield first
+                yield from chunks
+                return
+            except Exception as e:
+                if started:
+                    error_msg = f"❌ LLM stream interrupted after the first token: {e}"
+                    logger.error(error_msg, exc_info=True)
+                    raise RuntimeError(error_msg) from e
+
+                self.backoff(e, attempt)
+
+        error_msg = f"❌ Failed to stream from LLM after multiple retries. Please check your LLM subscription for more details."
+        logger.error(error_msg, exc_info=True)
+
+        raise RuntimeError(error_msg)
+
+
+
+def create_retriever(vs, bm25=None):
     """
-    Creates a retriever from the given vector store using MMR.
+    Creates a retriever from the given vector store.
+
+    Uses hybrid BM25 + vector retrieval when a BM25 index is given and RETRIEVAL_MODE is
+    'hybrid', and Maximal Marginal Relevance over the vector store otherwise.
 
     Args:
         vs: The vector store instance.
+        bm25: The BM25 index over the same chunks, if any.
 
     Returns:
         A configured retriever object.
     """
     
-    retriever = vs.as_retriever(
-        search_type="mmr",  # Enables Maximal Marginal Relevance
-        search_kwargs={"k": 5, "lambda_mult": 0.5}  # Balance relevance and diversity
+    if bm25 is not None and RagConfig.RETRIEVAL_MODE == 'hybrid':
+        return HybridRetriever(
+            vector_store=vs,
+            bm25=bm25,
+            k=5,
+            fetch_k=RagConfig.HYBRID_FETCH_K,
+            rrf_k=RagConfig.HYBRID_RRF_K,
+            sparse_fast_path=RagConfig.SPARSE_FAST_PATH,
+            keyword_max_terms=RagConfig.SPARSE_MAX_TERMS,
+            keyword_min_idf=RagConfig.SPARSE_MIN_IDF
+        )
+    
+    retriever = MMRRetriever(
+        vector_store=vs,
+        k=5,
+        fetch_k=RagConfig.MMR_FETCH_K,
+        lambda_mult=RagConfig.MMR_LAMBDA  # Balance relevance and diversity
     )
 
     return retriever
@@ -79,18 +161,26 @@ def initialize_rag_pipeline():
         logger.info("Initializing RAG LLM...")
         llm_model = RagLLM()
 
-        logger.info("Loading Mistral embeddings model...")
-        embedding_model = MistralAIEmbeddings(
-            model='mistral-embed',
-            api_key=RagConfig.MISTRAL_API_KEY,
-            wait_time=2
-        )
+        logger.info("Loading embeddings model...")
+        embedding_model = get_embedding_model()
+
+        if RagConfig.EMBEDDING_CACHE_ENABLED:
+            logger.info("Enabling query embedding cache...")
+            embedding_model = CachedEmbeddings(
+                embedding_model,
+                model_name=embedding_model_name(),
+                path=RagConfig.EMBEDDING_CACHE_PATH,
+                memory_size=RagConfig.EMBEDDING_CACHE_MEMORY_SIZE,
+                max_rows=RagConfig.EMBEDDING_CACHE_MAX_ROWS,
+                ttl=RagConfig.EMBEDDING_CACHE_TTL
+            )
 
         logger.info("Loading or building FAISS vector store...")
-        vector_store = load_vector_store()
+        vector_store = load_vector_store(embedding_model)
 
         logger.info("Creating retriever from vector store...")
-        retriever = create_retriever(vector_store)
+        bm25 = load_bm25_index() if RagConfig.RETRIEVAL_MODE == 'hybrid' else None
+        retriever = create_retriever(vector_store, bm25)
 
         logger.info("RAG pipeline initialized successfully.")
 
@@ -1,4 +1,6 @@
 from app import db
+from app.config import AppConfig
+from app.pagination import keyset_page
 
 
 class User(db.Model):
@@ -22,7 +24,17 @@ class User(db.Model):
             'id': self.id,
             'name': self.name,
             'email': self.email,
-            'chats': sorted([chat.to_json(basic=True) for chat in self.chats], key=lambda x: x['chat_id'], reverse=True)
+            **self.chats_page()
+        }
+
+    def chats_page(self, cursor=None, limit=AppConfig.CHATS_PAGE_SIZE):
+        """Returns one page of the user's chats, newest first, and the cursor of the next page."""
+        
+        chats, next_cursor = keyset_page(Chat.query.filter_by(user_id=self.id), Chat.id, cursor, limit)
+        
+        return {
+            'chats': [chat.to_json(basic=True) for chat in chats],
+            'chats_next_cursor': next_cursor
         }
 
 
@@ -32,8 +44,9 @@ class Chat(db.Model):
     
     __tablename__ = 'chat'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     title = db.Column(db.String(256))
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     messages = db.relationship('ShortTermMemory', backref='parent_chat', cascade="all, delete-orphan")
     long_term_memories = db.relationship('LongTermMemory', backref='parent_chat', cascade="all, delete-orphan")
@@ -42,6 +55,7 @@ class Chat(db.Model):
         
         self.user_id = user_id
         self.title = title
+        self.message_count = 0
 
     def to_json(self, basic=False):
         
@@ -51,10 +65,25 @@ class Chat(db.Model):
             'title': self.title,
         }
         if not basic:
-            data['messages'] = [m.to_json() for m in self.messages]
+            data.update(self.messages_page())
             
         return data
 
+    def messages_page(self, cursor=None, limit=AppConfig.MESSAGES_PAGE_SIZE):
+        """
+        Returns one page of the chat's messages and the cursor of the next (older) page.
+
+        Pages are selected newest first, and the messages within a page are in chronological order.
+        """
+        
+        messages, next_cursor = keyset_page(ShortTermMemory.query.filter_by(chat_id=self.id),
+                                            ShortTermMemory.id, cursor, limit)
+        
+        return {
+            'messages': [m.to_json() for m in reversed(messages)],
+            'next_cursor': next_cursor
+        }
+
 
 
 class ShortTermMemory(db.Model):
@@ -62,7 +91,7 @@ class ShortTermMemory(db.Model):
     
     __tablename__ = 'short_term_memory'
     id = db.Column(db.Integer, primary_key=True)
-    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False, index=True)
     question = db.Column(db.Text)
     answer = db.Column(db.Text)
 
@@ -87,13 +116,18 @@ class LongTermMemory(db.Model):
     
     __tablename__ = 'long_term_memory'
     id = db.Column(db.Integer, primary_key=True)
-    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id'), nullable=False, index=True)
     summary = db.Column(db.Text)
+    summary_embedding = db.Column(db.LargeBinary, nullable=True)
+    # Id of the newest ShortTermMemory row the summary covers
+    last_message_id = db.Column(db.Integer, nullable=True)
 
-    def __init__(self, chat_id, summary):
+    def __init__(self, chat_id, summary, last_message_id=None):
         
         self.chat_id = chat_id
         self.summary = summary
+        self.summary_embedding = None
+        self.last_message_id = last_message_id
 
     def to_json(self):
         
@@ -103,6 +137,31 @@ class LongTermMemory(db.Model):
         }
 
 
+class SummaryJob(db.Model):
+    """A pending or running long-term summary update for a chat (at most one per chat)."""
+    
+    __tablename__ = 'summary_job'
+    id = db.Column(db.Integer, primary_key=True)
+    chat_id = db.Column(db.Integer, db.ForeignKey('chat.id', ondelete='CASCADE'), nullable=False, unique=True)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    rerun = db.Column(db.Boolean, nullable=False, default=False)
+    coalesced = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+
+    def __init__(self, chat_id, available_at):
+        
+        self.chat_id = chat_id
+        self.status = 'pending'
+        self.rerun = False
+        self.coalesced = 0
+        self.attempts = 0
+        self.available_at = available_at
+        self.updated_at = available_at
+
+
+
 # {
 #     'chat_id': chat_id,
 #     'user_id': user_id,
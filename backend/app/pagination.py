@@ -0,0 +1,55 @@
+def page_args(args, default_limit, max_limit):
+    """
+    Parses keyset pagination arguments (`?cursor=<id>&limit=<n>`) from a request's query string.
+
+    Args:
+        args: The request args.
+        default_limit: Page size used when no limit is given.
+        max_limit: Largest page size allowed.
+
+    Returns:
+        A tuple of (cursor or None, limit).
+
+    Raises:
+        ValueError: If the cursor or limit is not a positive integer.
+    """
+
+    try:
+        cursor = int(args['cursor']) if args.get('cursor') else None
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError("cursor and limit must be integers")
+
+    if (cursor is not None and cursor < 1) or limit < 1:
+        raise ValueError("cursor and limit must be positive")
+
+    return cursor, min(limit, max_limit)
+
+
+def keyset_page(query, column, cursor, limit):
+    """
+    Fetches one page of rows in descending `column` order, starting after a cursor.
+
+    The page is selected in SQL with `column < cursor ORDER BY column DESC LIMIT limit + 1`,
+    so its cost does not depend on how many pages come before it. The extra row only tells
+    whether another page exists.
+
+    Args:
+        query: The filtered SQLAlchemy query.
+        column: The unique, indexed column ordering the pages (the primary key).
+        cursor: The value returned as `next_cursor` by the previous page, or None for the first page.
+        limit: Page size.
+
+    Returns:
+        A tuple of (rows, next_cursor); next_cursor is None on the last page.
+    """
+
+    if cursor is not None:
+        query = query.filter(column < cursor)
+
+    rows = query.order_by(column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, getattr(rows[-1], column.key)
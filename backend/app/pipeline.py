@@ -0,0 +1,111 @@
+import threading
+import time
+from app import llm
+from app.config import RagConfig
+from app.log import logger
+from app.semantic_cache import create_semantic_cache
+
+
+class RagPipeline:
+    """
+    Holds the RAG components and builds them in a background warm-up thread.
+
+    The app starts serving immediately; chat endpoints check `ready` and answer 503 until
+    the LLM client, embeddings and vector store are loaded. A failed load is retried on
+    demand, at most once every PIPELINE_RETRY_AFTER seconds.
+    """
+
+    def __init__(self):
+
+        self.state = 'pending'
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+        self.llm_model = None
+        self.embedding_model = None
+        self.vector_store = None
+        self.retriever = None
+        self.semantic_cache = None
+
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def start(self):
+        """Starts loading the pipeline in a background thread, unless it is loading or loaded."""
+
+        with self.lock:
+            if self.state in ('loading', 'ready'):
+                return
+            if self.state == 'failed' and time.time() - self.finished_at < RagConfig.PIPELINE_RETRY_AFTER:
+                return
+
+            self.state = 'loading'
+            self.error = None
+            self.started_at = time.time()
+
+        threading.Thread(target=self.load, name='rag-warmup', daemon=True).start()
+
+    def load(self):
+        """Builds every pipeline component (runs in the warm-up thread)."""
+
+        try:
+            llm_model, embedding_model, vector_store, retriever = llm.initialize_rag_pipeline()
+            semantic_cache = create_semantic_cache()
+
+        except Exception as e:
+            with self.lock:
+                self.state = 'failed'
+                self.error = str(e)
+                self.finished_at = time.time()
+
+            logger.error(f"❌ RAG pipeline failed to load: {e}", exc_info=True)
+            return
+
+        with self.lock:
+            self.llm_model = llm_model
+            self.embedding_model = embedding_model
+            self.vector_store = vector_store
+            self.retriever = retriever
+            self.semantic_cache = semantic_cache
+            self.state = 'ready'
+            self.finished_at = time.time()
+
+        self.loaded.set()
+        logger.info(f"✅ RAG pipeline ready in {self.finished_at - self.started_at:.1f}s")
+
+    def wait(self, timeout=None):
+        """
+        Starts the pipeline if needed and blocks until it is loaded or the load fails.
+
+        Returns:
+            True if the pipeline is ready, False if it failed or the timeout expired.
+        """
+
+        self.start()
+        deadline = None if timeout is None else time.time() + timeout
+
+        while not self.loaded.wait(0.5):
+            if self.state == 'failed' or (deadline is not None and time.time() >= deadline):
+                return False
+
+        return True
+
+    def status(self):
+        """Returns the pipeline state for the health endpoints."""
+
+        status = {'state': self.state}
+        if self.error:
+            status['error'] = self.error
+        if self.ready:
+            status['load_seconds'] = round(self.finished_at - self.started_at, 2)
+            status['vectors'] = int(self.vector_store.index.ntotal)
+
+        return status
+
+
+pipeline = RagPipeline()
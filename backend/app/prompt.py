@@ -0,0 +1,190 @@
+import threading
+from app.config import RagConfig
+from app.log import logger
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    Loads the tiktoken encoding used to count prompt tokens, once per process.
+
+    Returns:
+        The tiktoken Encoding, or False if tiktoken or the encoding is unavailable
+        (e.g. the encoding file cannot be downloaded), in which case tokens are estimated.
+    """
+
+    global _encoding
+
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(RagConfig.PROMPT_TOKENIZER)
+
+            except Exception as e:
+                logger.warning(f"⚠️ Tokenizer '{RagConfig.PROMPT_TOKENIZER}' unavailable, estimating 4 characters per token: {e}")
+                _encoding = False
+
+    return _encoding
+
+
+def count_tokens(text):
+    """Returns the number of tokens in a text."""
+
+    if not text:
+        return 0
+
+    encoding = get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, budget):
+    """
+    Cuts a text down to at most `budget` tokens, keeping its beginning.
+
+    Returns:
+        A tuple of (text, tokens).
+    """
+
+    tokens = count_tokens(text)
+    if tokens <= budget:
+        return text, tokens
+
+    encoding = get_encoding()
+    if encoding:
+        text = encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    else:
+        text = text[:budget * 4]
+
+    return text, count_tokens(text)
+
+
+def turn_tokens(message):
+    """Returns the number of tokens of one formatted question / answer turn."""
+
+    return count_tokens(f"User: {message.question}\nAI: {message.answer}\n")
+
+
+class PromptBudget:
+    """
+    Fits the sections of a RAG prompt into their token budgets.
+
+    Every section is first cut to its own budget: the query and the summary are truncated,
+    the oldest turns of the short-term memory are dropped, and the lowest-ranked chunks are
+    dropped (the top chunk is truncated rather than dropped). If the prompt is still above
+    the total budget, more of the oldest turns and then of the lowest-ranked chunks are
+    dropped, and finally the summary, the query and the best chunk are truncated further,
+    so the prompt never exceeds the total budget and those three are the last to go.
+    """
+
+    def __init__(self, query=None, short_term=None, long_term=None, chunks=None, total=None):
+        """
+        Args:
+            query: Token budget of the user query (defaults to PROMPT_QUERY_TOKENS).
+            short_term: Token budget of the recent turns (defaults to PROMPT_SHORT_TERM_TOKENS).
+            long_term: Token budget of the summary (defaults to PROMPT_LONG_TERM_TOKENS).
+            chunks: Token budget of the retrieved chunks (defaults to PROMPT_CHUNK_TOKENS).
+            total: Token budget of the whole prompt (defaults to PROMPT_MAX_TOKENS).
+        """
+
+        self.query = query or RagConfig.PROMPT_QUERY_TOKENS
+        self.short_term = short_term or RagConfig.PROMPT_SHORT_TERM_TOKENS
+        self.long_term = long_term or RagConfig.PROMPT_LONG_TERM_TOKENS
+        self.chunks = chunks or RagConfig.PROMPT_CHUNK_TOKENS
+        self.total = total or RagConfig.PROMPT_MAX_TOKENS
+
+    def fit(self, query, docs, summary=None, messages=None, overhead=0):
+        """
+        Fits the prompt sections into the budgets.
+
+        Args:
+            query: The user query.
+            docs: The retrieved documents, best first.
+            summary: The long-term memory summary, if any.
+            messages: The recent ShortTermMemory rows, oldest first.
+            overhead: Tokens of the fixed parts of the prompt (instructions, headers).
+
+        Returns:
+            A tuple of (query, docs, summary, messages, usage), where usage maps each
+            section to its token count and the number of kept / available items.
+        """
+
+        messages = messages or []
+        query, query_tokens = truncate_tokens(query, self.query)
+        summary, summary_tokens = truncate_tokens(summary, self.long_term) if summary else (summary, 0)
+
+        # Newest turns first, so the oldest are the ones left out
+        turns = []
+        turns_tokens = 0
+        for message, tokens in reversed([(m, turn_tokens(m)) for m in messages]):
+            if turns_tokens + tokens > self.short_term:
+                break
+            turns.insert(0, (message, tokens))
+            turns_tokens += tokens
+
+        chunks = []
+        chunks_tokens = 0
+        for doc in docs:
+            tokens = count_tokens(doc.page_content) + 1
+            if chunks_tokens + tokens > self.chunks:
+                if not chunks:
+                    # Never answer without context because the best chunk is too long
+                    doc = doc.model_copy() if hasattr(doc, 'model_copy') else doc.copy()
+                    doc.page_content, tokens = truncate_tokens(doc.page_content, self.chunks - 1)
+                    chunks.append((doc, tokens + 1))
+                    chunks_tokens += tokens + 1
+                break
+            chunks.append((doc, tokens))
+            chunks_tokens += tokens
+
+        fixed = overhead + query_tokens + summary_tokens
+        while turns and fixed + turns_tokens + chunks_tokens > self.total:
+            turns_tokens -= turns.pop(0)[1]
+        while len(chunks) > 1 and fixed + turns_tokens + chunks_tokens > self.total:
+            chunks_tokens -= chunks.pop()[1]
+
+        # Still too long when the section budgets add up to more than the total
+        excess = fixed + turns_tokens + chunks_tokens - self.total
+        if excess > 0 and summary:
+            summary, tokens = truncate_tokens(summary, max(summary_tokens - excess, 0))
+            excess -= summary_tokens - tokens
+            summary_tokens = tokens
+        if excess > 0:
+            query, tokens = truncate_tokens(query, max(query_tokens - excess, 0))
+            excess -= query_tokens - tokens
+            query_tokens = tokens
+        if excess > 0 and chunks:
+            doc, tokens = chunks[0]
+            doc = doc.model_copy() if hasattr(doc, 'model_copy') else doc.copy()
+            doc.page_content, kept = truncate_tokens(doc.page_content, max(tokens - 1 - excess, 0))
+            chunks[0] = (doc, kept + 1)
+            chunks_tokens -= tokens - kept - 1
+        fixed = overhead + query_tokens + summary_tokens
+
+        usage = {
+            'query': query_tokens,
+            'chunks': chunks_tokens,
+            'chunks_kept': f"{len(chunks)}/{len(docs)}",
+            'long_term': summary_tokens,
+            'short_term': turns_tokens,
+            'turns_kept': f"{len(turns)}/{len(messages)}",
+            'total': fixed + turns_tokens + chunks_tokens
+        }
+
+        return query, [doc for doc, _ in chunks], summary, [message for message, _ in turns], usage
+
+    def log(self, usage, label=None):
+        """Logs the token usage of each prompt section against its budget."""
+
+        logger.info(f"Prompt tokens{f' for {label}' if label else ''}: "
+                    f"query {usage['query']}/{self.query}, "
+                    f"chunks {usage['chunks']}/{self.chunks} ({usage['chunks_kept']} kept), "
+                    f"long-term {usage['long_term']}/{self.long_term}, "
+                    f"short-term {usage['short_term']}/{self.short_term} ({usage['turns_kept']} turns kept), "
+                    f"total {usage['total']}/{self.total}")
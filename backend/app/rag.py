@@ -1,8 +1,90 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.prompts import PromptTemplate
-from app.llm import initialize_rag_pipeline
-from app.models import ShortTermMemory, LongTermMemory
+from app.config import RagConfig
+from app.rate_limit import Priority
+from app.models import LongTermMemory
+from app.pipeline import pipeline
+from app.prompt import PromptBudget, count_tokens
 from app import db
-llm_model, embedding_model, vector_store, retriever = initialize_rag_pipeline()
+from app.log import logger
+
+# Shared pool for retrieval, which never waits on the LLM rate limiter
+executor = ThreadPoolExecutor(max_workers=RagConfig.RAG_WORKERS, thread_name_prefix='rag')
+# Separate pool for rate-limited LLM calls (titles, query rewrites), whose threads can sleep
+# in the limiter for seconds; retrieval futures never queue behind them
+llm_executor = ThreadPoolExecutor(max_workers=RagConfig.LLM_WORKERS, thread_name_prefix='rag-llm')
+
+
+def timed_call(fn, *args):
+    """
+    Calls a function and measures its wall-clock duration.
+
+    Returns:
+        A tuple of (result, elapsed seconds).
+    """
+    
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+# Counters of summary relevance decisions, used to tune the embedding gate thresholds
+relevance_decisions = {'gate_yes': 0, 'gate_no': 0, 'llm_yes': 0, 'llm_no': 0}
+relevance_lock = threading.Lock()
+
+
+def count_relevance_decision(decision):
+    """Records a summary relevance decision and periodically logs the counters."""
+    
+    with relevance_lock:
+        relevance_decisions[decision] += 1
+        total = sum(relevance_decisions.values())
+        snapshot = dict(relevance_decisions)
+
+    if total % 50 == 0:
+        logger.info(f"Summary relevance decisions: {snapshot}")
+
+
+def embedding_relevance(ltm_row, new_turn):
+    """
+    Decides summary relevance locally from embedding similarity when it is clear-cut.
+
+    The summary embedding is computed once and stored on the LongTermMemory row. A new
+    turn very similar to the summary is already covered ("no"); a very dissimilar one is
+    a new topic ("yes"). The band in between is left to the LLM check.
+
+    Args:
+        ltm_row: The LongTermMemory row of the chat.
+        new_turn: The formatted conversation turns not yet summarized.
+
+    Returns:
+        "yes", "no", or None if the similarity is ambiguous or the gate is disabled.
+    """
+    
+    if not RagConfig.SUMMARY_GATE_ENABLED:
+        return None
+
+    if ltm_row.summary_embedding is None:
+        vector = pipeline.embedding_model.embed_documents([ltm_row.summary])[0]
+        ltm_row.summary_embedding = np.asarray(vector, dtype='float32').tobytes()
+        db.session.commit()
+
+    summary_vector = np.frombuffer(ltm_row.summary_embedding, dtype='float32')
+    turn_vector = np.asarray(pipeline.embedding_model.embed_documents([new_turn])[0], dtype='float32')
+
+    similarity = float(summary_vector @ turn_vector /
+                       (np.linalg.norm(summary_vector) * np.linalg.norm(turn_vector) or 1.0))
+
+    if similarity >= RagConfig.SUMMARY_GATE_COVERED:
+        return "no"
+    if similarity <= RagConfig.SUMMARY_GATE_NEW_TOPIC:
+        return "yes"
+
+    return None
 
 
 def format_messages(messages):
@@ -26,26 +108,35 @@ def format_messages(messages):
     return "\n".join(formatted_messages)
 
 
-def generate_summary(chat):
+def generate_summary(context):
     """
     Generates a summary of the conversation using the LLM.
 
+    Every turn stored after the summary's `last_message_id` is folded in, so turns that
+    arrived while the summary job was queued (coalesced into one job) are not lost.
+
     Args:
-       chat: A Chat object containing previous messages.
+       context: The ChatContext of the chat (recent messages and current summary).
 
     Returns:
         The generated summary string.
     """
 
-    ltm_exists = LongTermMemory.query.filter_by(chat_id=chat.id).first()
-    ltm = None
-
-    if ltm_exists:
-        ltm = ltm_exists.summary
+    ltm_exists = context.long_term_memory
+    ltm = context.summary
 
     if ltm:
-        # - First check for relevance of the last new chat message to existing summary
-        last_message = format_messages(chat.messages[:-1])
+        # - First check for relevance of the new chat messages to existing summary
+        if ltm_exists.last_message_id is None:
+            # Summaries written before the marker existed only know the newest turn is new
+            new_messages = context.recent_messages[-1:]
+        else:
+            new_messages = context.messages_after(ltm_exists.last_message_id)
+
+        if not new_messages:
+            return ltm
+
+        last_message = format_messages(new_messages)
         relevance_prompt = PromptTemplate(
             input_variables=["summary", "new_message"],
             template="""
@@ -65,12 +156,18 @@ def generate_summary(chat):
             """
         )
 
-        relevance_check = llm_model.invoke(relevance_prompt.format(
-            summary=ltm,
-            new_message=last_message
-        )).content.strip().lower()
+        relevance_check = embedding_relevance(ltm_exists, last_message)
+
+        if relevance_check is not None:
+            count_relevance_decision(f"gate_{relevance_check}")
+        else:
+            relevance_check = pipeline.llm_model.invoke(relevance_prompt.format(
+                summary=ltm,
+                new_message=last_message
+            ), priority=Priority.SUMMARY).content.strip().lower()
+            count_relevance_decision("llm_yes" if relevance_check == "yes" else "llm_no")
 
-        # - If relevant, append it to the summary, by summarising again using that summary and the last message
+        # - If relevant, append them to the summary, by summarising again using that summary and the new messages
         if relevance_check == "yes":
 
             update_prompt = PromptTemplate(
@@ -92,23 +189,28 @@ def generate_summary(chat):
                 Updated Summary:
                 """
             )
-            updated_summary = llm_model.invoke(update_prompt.format(
+            updated_summary = pipeline.llm_model.invoke(update_prompt.format(
                 summary=ltm,
                 new_message=last_message
-            )).content.strip()
+            ), priority=Priority.SUMMARY).content.strip()
 
             ltm_exists.summary = updated_summary
+            ltm_exists.summary_embedding = None
+            ltm_exists.last_message_id = new_messages[-1].id
             db.session.commit()
 
             return updated_summary
 
         else:
-            # If not relevant, return the existing summary
+            # If not relevant, keep the existing summary and only record the messages as seen
+            ltm_exists.last_message_id = new_messages[-1].id
+            db.session.commit()
             return ltm
 
     else:
         # Create a new summary if no long-term memory exists
-        full_chat = format_messages(chat.messages)
+        messages = context.all_messages()
+        full_chat = format_messages(messages)
 
         new_summary_prompt = PromptTemplate(
             input_variables=["messages_tb_summarized"],
@@ -127,38 +229,38 @@ def generate_summary(chat):
             """
         )
 
-        new_summary = llm_model.invoke(new_summary_prompt.format(
+        new_summary = pipeline.llm_model.invoke(new_summary_prompt.format(
             messages_tb_summarized=full_chat
-        )).content.strip()
+        ), priority=Priority.SUMMARY).content.strip()
 
         # Store in DB
-        new_ltm = LongTermMemory(chat_id=chat.id, summary=new_summary)
+        new_ltm = LongTermMemory(chat_id=context.chat_id, summary=new_summary,
+                                 last_message_id=messages[-1].id if messages else None)
         db.session.add(new_ltm)
         db.session.commit()
+        context.long_term_memory = new_ltm
 
         return ltm
 
 
-def optimize_query(query, chat):
+def optimize_query(query, context):
     """
     Rewrites a user follow-up query into a standalone question using recent chat history.
 
-    This function retrieves the last 3 messages from the short-term memory of a chat session,
+    This function takes the last 3 messages of a chat session from its preloaded context,
     formats them into a structured chat history, and combines them with the user’s follow-up input.
     It then prompts a language model to generate a complete, context-rich standalone version of the query.
+    No database access is made, so the rewrite can safely run on a worker thread.
 
     Args:
         query (str): The follow-up query entered by the user that requires contextual rewriting.
-        chat (Chat): A Chat object containing metadata like chat ID used to retrieve recent messages.
+        context (ChatContext): The chat context holding the recent messages.
 
     Returns:
         str: A rewritten, contextually complete standalone question derived from the follow-up query.
     """
     
-    
-    messages = ShortTermMemory.query.filter_by(chat_id=chat.id).all()[-3:]
-    
-    chat_history = format_messages(messages)
+    chat_history = format_messages(context.recent_messages)
     
     prompt_template = PromptTemplate(
         input_variables=["chat_history", "user_query"],
@@ -185,7 +287,7 @@ def optimize_query(query, chat):
         user_query=query
     )
 
-    new_query = llm_model.invoke(prompt)
+    new_query = pipeline.llm_model.invoke(prompt, priority=Priority.REWRITE)
     
     return new_query.content.strip()
 
@@ -218,50 +320,147 @@ def get_title(first_query):
     )
 
     prompt = title_prompt.format(query=first_query)
-    response = llm_model.invoke(prompt)
+    response = pipeline.llm_model.invoke(prompt, priority=Priority.TITLE)
 
     return response.content.strip()
 
 
-def get_rag_reply_v2(query, chat):
+def document_key(doc):
+    """Returns a stable de-duplication key for a retrieved chunk (its id, or a hash of its content)."""
+    
+    if getattr(doc, 'id', None):
+        return doc.id
+    
+    return hashlib.sha1(doc.page_content.encode('utf-8')).hexdigest()
+
+
+def merge_documents(primary, secondary, limit):
     """
-    Generates a RAG-based reply to a user query using memory and retrieved documents.
+    Merges two ranked document lists, de-duplicated by chunk id.
+
+    The lists are interleaved rank by rank, starting with the primary list.
+
+    Args:
+        primary: Documents retrieved for the original query.
+        secondary: Documents retrieved for the rewritten query.
+        limit: Maximum number of documents to return.
+
+    Returns:
+        The merged list of documents.
+    """
+    
+    merged = []
+    seen = set()
+    
+    for i in range(max(len(primary), len(secondary))):
+        for docs in (primary, secondary):
+            if i < len(docs):
+                key = document_key(docs[i])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(docs[i])
+
+    return merged[:limit]
+
+
+def build_rag_prompt(query, context):
+    """
+    Builds the final RAG prompt for a user query using memory and retrieved documents.
+
+    In pipelined mode retrieval for the original query and the query rewrite run
+    concurrently (on the retrieval and LLM pools), so the critical path is the slower of them rather
+    than their sum. Optionally a second retrieval pass on the rewritten query is merged
+    into the results.
 
     Args:
         query: The user's current query.
-        chat: The chat object containing previous messages and memories.
+        context: The ChatContext holding the recent messages and the summary.
 
     Returns:
-        A string response generated by the LLM.
+        The prompt string to be sent to the LLM.
     """
 
-    # Fetch and format short-term memory
+    start = time.perf_counter()
+    pipelined = RagConfig.PIPELINED_RETRIEVAL
+
+    # Retrieval does not depend on the rewrite, start it first
+    retrieval_future = executor.submit(timed_call, pipeline.retriever.get_relevant_documents, query) if pipelined else None
+
+    # Format short-term memory
     
     optimized_query = query
     
-    messages = []
-    short_term = None
-    if len(chat.messages) != 0:
-        messages = ShortTermMemory.query.filter_by(
-            chat_id=chat.id).all()[-3:]
-        short_term = format_messages(messages)
-        
-        optimized_query = optimize_query(query, chat)
-
-    # Fetch long-term memory summary
-    long_term = None
-    
-    lts = LongTermMemory.query.filter_by(chat_id=chat.id).first()
-    long_term = lts.summary if lts else None
+    rewrite_future = None
+    rewrite_time = 0.0
+    if context.has_history:
+        if pipelined:
+            rewrite_future = llm_executor.submit(timed_call, optimize_query, query, context)
+        else:
+            optimized_query, rewrite_time = timed_call(optimize_query, query, context)
+
+    # Long-term memory summary
+    long_term = context.summary
 
     # Retrieve documents
-    retrieved_docs = retriever.get_relevant_documents(query)
+    if pipelined:
+        retrieved_docs, retrieval_time = retrieval_future.result()
+        if rewrite_future is not None:
+            optimized_query, rewrite_time = rewrite_future.result()
+    else:
+        retrieved_docs, retrieval_time = timed_call(pipeline.retriever.get_relevant_documents, query)
+
+    if RagConfig.RETRIEVAL_SECOND_PASS and optimized_query != query:
+        second_docs, second_time = timed_call(pipeline.retriever.get_relevant_documents, optimized_query)
+        retrieval_time += second_time
+        retrieved_docs = merge_documents(retrieved_docs, second_docs, RagConfig.RETRIEVAL_MAX_DOCS)
+
+    logger.info(f"Context for chat {context.chat_id} ready in {time.perf_counter() - start:.2f}s "
+                f"(rewrite {rewrite_time:.2f}s, retrieval {retrieval_time:.2f}s, pipelined={pipelined})")
+
+    return format_rag_prompt(optimized_query, retrieved_docs, long_term, context.recent_messages,
+                             label=f"chat {context.chat_id}")
+
+
+PROMPT_HEADER = "You are a trusted, careful AI medical assistant."
+
+PROMPT_INSTRUCTIONS = """
+        Instructions:
+        - Use only the above mentioned information if available.
+        - If unsure, refer the user to a doctor.
+        - Do not mention or reference any documents, memory, context source, or prior chat turns in your answer.
+
+        Response:"""
+
+def format_rag_prompt(query, retrieved_docs, long_term=None, messages=None, label=None):
+    """
+    Assembles the RAG prompt from the query, the retrieved documents and the chat memory.
+
+    Each section is fitted into its token budget by PromptBudget (oldest turns are dropped
+    first, then the lowest-ranked chunks) and the token usage is logged.
+
+    Args:
+        query: The (rewritten) user query.
+        retrieved_docs: The retrieved documents, best first.
+        long_term: The long-term memory summary, if any.
+        messages: The recent messages, oldest first, if any.
+        label: Identifies the request in the token usage log (e.g. the chat).
+
+    Returns:
+        The prompt string to be sent to the LLM.
+    """
+
+    budget = PromptBudget()
+    query, retrieved_docs, long_term, messages, usage = budget.fit(
+        query, retrieved_docs, long_term, messages, overhead=count_tokens(PROMPT_HEADER + PROMPT_INSTRUCTIONS))
+    budget.log(usage, label)
+
     retrieved_text = "\n".join(doc.page_content for doc in retrieved_docs) if len(
         retrieved_docs) > 0 else None
+    short_term = format_messages(messages) if messages else None
 
     # Build the dynamic prompt
-    sections = [f"You are a trusted, careful AI medical assistant.",
-                f"\n[User Query]\n{optimized_query}"]
+    sections = [PROMPT_HEADER,
+                f"\n[User Query]\n{query}"]
 
     if retrieved_text:
         sections.append(f"\n[Relevant Medical Documents]\n{retrieved_text}")
@@ -270,16 +469,146 @@ def get_rag_reply_v2(query, chat):
     if short_term:
         sections.append(f"\n[Short-Term Memory]\n{short_term}")
 
-    sections.append("""
-        Instructions:
-        - Use only the above mentioned information if available.
-        - If unsure, refer the user to a doctor.
-        - Do not mention or reference any documents, memory, context source, or prior chat turns in your answer.
+    sections.append(PROMPT_INSTRUCTIONS)
+
+    return "\n".join(sections)
+
 
-        Response:""")
+def semantic_cache_vector(query, context):
+    """
+    Returns the embedding used as semantic cache key, if the query is cacheable.
+
+    Only queries without any memory context (the first turn of a chat, where the
+    standalone question is the query itself) are cached.
+
+    Args:
+        query: The user's current query.
+        context: The ChatContext of the chat the query belongs to.
+
+    Returns:
+        The query embedding, or None if the cache is disabled or the chat has history.
+    """
+
+    if pipeline.semantic_cache is None or context.has_history:
+        return None
+
+    return pipeline.embedding_model.embed_query(query)
 
-    prompt = "\n".join(sections)
+
+def get_rag_reply_v2(query, context):
+    """
+    Generates a RAG-based reply to a user query using memory and retrieved documents.
+
+    Args:
+        query: The user's current query.
+        context: The ChatContext holding the recent messages and the summary.
+
+    Returns:
+        A string response generated by the LLM.
+    """
+
+    cache_vector = semantic_cache_vector(query, context)
+    if cache_vector is not None:
+        cached = pipeline.semantic_cache.lookup(cache_vector)
+        if cached is not None:
+            return cached
+
+    prompt = build_rag_prompt(query, context)
 
     # Generate and return the AI response
-    ai_response = llm_model.invoke(prompt)
+    ai_response = pipeline.llm_model.invoke(prompt)
+
+    if cache_vector is not None:
+        pipeline.semantic_cache.add(cache_vector, query, ai_response.content)
+
     return ai_response.content
+
+
+def stream_rag_reply(query, context):
+    """
+    Streams a RAG-based reply to a user query token by token.
+
+    Query rewriting and retrieval run before the first chunk is produced,
+    so the time to first token is bounded by those steps rather than the full generation.
+
+    Args:
+        query: The user's current query.
+        context: The ChatContext holding the recent messages and the summary.
+
+    Yields:
+        Text chunks of the LLM response as they are generated.
+    """
+
+    cache_vector = semantic_cache_vector(query, context)
+    if cache_vector is not None:
+        cached = pipeline.semantic_cache.lookup(cache_vector)
+        if cached is not None:
+            yield cached
+            return
+
+    prompt = build_rag_prompt(query, context)
+
+    chunks = []
+    for chunk in pipeline.llm_model.stream(prompt):
+        if chunk.content:
+            chunks.append(chunk.content)
+            yield chunk.content
+
+    if cache_vector is not None:
+        pipeline.semantic_cache.add(cache_vector, query, "".join(chunks))
+
+
+
+def answer_batch(questions, concurrency=None):
+    """
+    Answers a list of standalone questions, yielding each result as soon as it is ready.
+
+    Retrieval for the whole batch uses one batched embedding call and one multi-query
+    FAISS search. Answers are then generated on a dedicated pool of `concurrency` threads
+    at the lowest rate limiter priority, so interactive chats are served first. No chat
+    or memory is stored.
+
+    Args:
+        questions: The questions to answer.
+        concurrency: Maximum number of answers generated at once (defaults to BATCH_CONCURRENCY).
+
+    Yields:
+        Dicts with the question's `index`, the `question` and either its `answer` and
+        generation `seconds`, or an `error`.
+    """
+
+    start = time.perf_counter()
+    retriever = pipeline.retriever
+
+    if hasattr(retriever, 'batch_retrieve'):
+        retrieved = retriever.batch_retrieve(questions)
+    else:
+        retrieved = [retriever.get_relevant_documents(question) for question in questions]
+
+    prompts = [format_rag_prompt(question, docs, label=f"batch question {i}")
+               for i, (question, docs) in enumerate(zip(questions, retrieved))]
+    logger.info(f"Batch of {len(questions)} questions retrieved in {time.perf_counter() - start:.2f}s")
+
+    def answer(prompt):
+        response, seconds = timed_call(pipeline.llm_model.invoke, prompt, Priority.BATCH)
+        return response.content, seconds
+
+    pool = ThreadPoolExecutor(max_workers=concurrency or RagConfig.BATCH_CONCURRENCY, thread_name_prefix='batch')
+    try:
+        futures = {pool.submit(answer, prompt): i for i, prompt in enumerate(prompts)}
+
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                content, seconds = future.result()
+                yield {'index': i, 'question': questions[i], 'answer': content, 'seconds': round(seconds, 2)}
+
+            except Exception as e:
+                logger.error(f"❌ Batch question {i} failed: {e}")
+                yield {'index': i, 'question': questions[i], 'error': str(e)}
+
+    finally:
+        # Stop queued generations if the consumer goes away (e.g. the client disconnects)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Batch of {len(questions)} questions answered in {time.perf_counter() - start:.2f}s")
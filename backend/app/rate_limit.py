@@ -0,0 +1,242 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from langchain_core.rate_limiters import BaseRateLimiter
+
+
+class Priority:
+    """Priority classes for LLM calls; lower values are served first."""
+
+    ANSWER = 0
+    REWRITE = 1
+    TITLE = 2
+    SUMMARY = 3
+    BATCH = 4
+
+
+class SharedRateLimiter(BaseRateLimiter):
+    """
+    Token bucket shared by every thread and worker process through a SQLite file.
+
+    Each acquire refills the bucket from the elapsed time inside a write transaction, so
+    N gunicorn workers together stay under the configured rate. Waiting callers register
+    their priority class; a caller only takes a token when no higher-priority caller is
+    waiting. A provider Retry-After can pause the bucket for every worker via `block_for`.
+    """
+
+    def __init__(self, path, requests_per_second, max_bucket_size=1, check_every_n_seconds=0.3, name='mistral'):
+        """
+        Args:
+            path: Path of the SQLite file holding the bucket state.
+            requests_per_second: Refill rate of the bucket.
+            max_bucket_size: Maximum number of tokens (burst size).
+            check_every_n_seconds: Polling interval while waiting for a token.
+            name: Bucket name, so several limits can share one file.
+        """
+
+        self.path = path
+        self.requests_per_second = requests_per_second
+        self.max_bucket_size = max_bucket_size
+        self.check_every_n_seconds = check_every_n_seconds
+        self.name = name
+        self.stale_after = max(5.0, 10 * check_every_n_seconds)
+        self.local = threading.local()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self.connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_bucket (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_waiter (
+                ticket TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO rate_bucket (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, 0)",
+            (name, float(max_bucket_size), time.time())
+        )
+
+    def connection(self):
+        """Returns this thread's SQLite connection."""
+
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+
+        return conn
+
+    @contextlib.contextmanager
+    def priority(self, value):
+        """Sets the priority class for acquires made by the current thread."""
+
+        previous = getattr(self.local, 'priority', Priority.ANSWER)
+        self.local.priority = value
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def try_acquire(self, ticket, priority):
+        """
+        Attempts to take a token in a single write transaction.
+
+        Returns:
+            True if a token was taken.
+        """
+
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            tokens, updated_at, blocked_until = conn.execute(
+                "SELECT tokens, updated_at, blocked_until FROM rate_bucket WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens = min(self.max_bucket_size, tokens + max(0.0, now - updated_at) * self.requests_per_second)
+
+            conn.execute("DELETE FROM rate_waiter WHERE seen_at < ?", (now - self.stale_after,))
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM rate_waiter WHERE name = ? AND priority < ?", (self.name, priority)
+            ).fetchone()[0]
+
+            acquired = now >= blocked_until and tokens >= 1 and ahead == 0
+            if acquired:
+                tokens -= 1
+                conn.execute("DELETE FROM rate_waiter WHERE ticket = ?", (ticket,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_waiter (ticket, name, priority, seen_at) VALUES (?, ?, ?, ?)",
+                    (ticket, self.name, priority, now)
+                )
+
+            conn.execute(
+                "UPDATE rate_bucket SET tokens = ?, updated_at = ? WHERE name = ?", (tokens, now, self.name)
+            )
+            conn.execute("COMMIT")
+            return acquired
+
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, *, blocking=True):
+        """
+        Takes a token from the shared bucket, honouring the current thread's priority.
+
+        Args:
+            blocking: If False, return immediately when no token is available.
+
+        Returns:
+            True if a token was taken, False otherwise.
+        """
+
+        priority = getattr(self.local, 'priority', Priority.ANSWER)
+        ticket = f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex}"
+
+        try:
+            while True:
+                if self.try_acquire(ticket, priority):
+                    return True
+                if not blocking:
+                    return False
+                time.sleep(self.check_every_n_seconds)
+
+        finally:
+            self.connection().execute("DELETE FROM rate_waiter WHERE ticket = ?", (ticket,))
+
+    async def aacquire(self, *, blocking=True):
+        """Async variant of `acquire` (runs the blocking poll in a thread)."""
+
+        return await asyncio.to_thread(self.acquire, blocking=blocking)
+
+    def block_for(self, seconds):
+        """Pauses the bucket for every worker, e.g. after a 429 with Retry-After."""
+
+        now = time.time()
+        self.connection().execute(
+            "UPDATE rate_bucket SET tokens = 0, updated_at = ?, blocked_until = MAX(blocked_until, ?) WHERE name = ?",
+            (now, now + seconds, self.name)
+        )
+
+
+def http_error(error):
+    """
+    Finds the exception carrying the HTTP response behind a provider error.
+
+    Provider clients retry internally (e.g. MistralAIEmbeddings through tenacity) and then
+    raise a wrapper such as `tenacity.RetryError` without a response, so the last attempt's
+    exception and the `__cause__` / `__context__` chain are followed.
+
+    Args:
+        error: The exception raised by the provider client.
+
+    Returns:
+        The first exception in the chain with a `response`, or None.
+    """
+
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, 'response', None) is not None:
+            return error
+
+        last_attempt = getattr(error, 'last_attempt', None)
+        if last_attempt is not None and last_attempt.failed:
+            error = last_attempt.exception()
+        else:
+            error = error.__cause__ or error.__context__
+
+    return None
+
+
+def status_code(error):
+    """Returns the HTTP status code attached to a provider error, if any."""
+
+    response = getattr(http_error(error), 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def retry_after_seconds(error):
+    """
+    Reads the Retry-After header of a provider error.
+
+    Args:
+        error: An exception raised by the HTTP client (e.g. httpx.HTTPStatusError), possibly wrapped.
+
+    Returns:
+        The number of seconds to wait, or None if the header is missing or invalid.
+    """
+
+    response = getattr(http_error(error), 'response', None)
+    headers = getattr(response, 'headers', None)
+    value = headers.get('Retry-After') if headers is not None else None
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,205 @@
+from typing import Any
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+from app.log import logger
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """
+    Fuses several rankings of FAISS positions with Reciprocal Rank Fusion.
+
+    Args:
+        rankings: Lists of positions, each ordered best first.
+        rrf_k: Damping constant; larger values flatten the contribution of top ranks.
+
+    Returns:
+        The fused list of positions, best first.
+    """
+
+    scores = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            scores[position] = scores.get(position, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def documents_at(vector_store, positions):
+    """Materializes the documents stored at the given FAISS positions."""
+
+    return [vector_store.docstore.search(vector_store.index_to_docstore_id[p]) for p in positions]
+
+
+def dense_search_batch(vector_store, vectors, fetch_k):
+    """Returns, for each query vector, the FAISS positions of its fetch_k nearest chunks, from one search call."""
+
+    _, positions = vector_store.index.search(np.asarray(vectors, dtype='float32'), fetch_k)
+    return [[int(p) for p in row if p != -1] for row in positions]
+
+
+def dense_search(vector_store, vector, fetch_k):
+    """Returns the FAISS positions of the fetch_k chunks nearest to a query vector, best first."""
+
+    return dense_search_batch(vector_store, [vector], fetch_k)[0]
+
+
+def mmr_select(query_vector, vectors, k, lambda_mult):
+    """
+    Selects k diverse rows with Maximal Marginal Relevance, using cosine similarity.
+
+    The query and pairwise similarities are computed as two matrix products; the greedy
+    selection then only updates a vector of per-candidate redundancies per pick.
+
+    Args:
+        query_vector: The query embedding, shape (d,).
+        vectors: The candidate embeddings, shape (n, d).
+        k: Number of rows to select.
+        lambda_mult: 1 for pure relevance, 0 for maximum diversity.
+
+    Returns:
+        The indexes of the selected rows, in selection order.
+    """
+
+    vectors = np.asarray(vectors, dtype='float32')
+    query_vector = np.asarray(query_vector, dtype='float32')
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = vectors / norms
+
+    relevance = unit @ (query_vector / (np.linalg.norm(query_vector) or 1.0))
+    similarity = unit @ unit.T
+
+    redundancy = np.zeros(len(vectors), dtype='float32')
+    available = np.ones(len(vectors), dtype=bool)
+    selected = []
+
+    for _ in range(min(k, len(vectors))):
+        scores = np.where(available, lambda_mult * relevance - (1.0 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return selected
+
+
+class MMRRetriever(BaseRetriever):
+    """
+    Maximal Marginal Relevance retriever over a FAISS vector store.
+
+    Fetches fetch_k candidates, reconstructs their vectors in one bulk call and runs the
+    MMR selection in NumPy. k, fetch_k and lambda_mult can be overridden per request,
+    e.g. `retriever.invoke(query, k=8, lambda_mult=0.7)`.
+    """
+
+    vector_store: Any
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def search_by_vector(self, vector, k=None, fetch_k=None, lambda_mult=None):
+        """
+        Runs the MMR search for an already embedded query.
+
+        Returns:
+            The selected documents, in selection order.
+        """
+
+        k = k or self.k
+        fetch_k = max(fetch_k or self.fetch_k, k)
+        lambda_mult = self.lambda_mult if lambda_mult is None else lambda_mult
+
+        return self.select(vector, dense_search(self.vector_store, vector, fetch_k), k, lambda_mult)
+
+    def select(self, vector, positions, k, lambda_mult):
+        """Runs the MMR selection over candidate positions and materializes the chosen documents."""
+
+        if not positions:
+            return []
+
+        candidates = self.vector_store.index.reconstruct_batch(np.asarray(positions, dtype='int64'))
+        selected = mmr_select(vector, candidates, k, lambda_mult)
+
+        return documents_at(self.vector_store, [positions[i] for i in selected])
+
+    def batch_retrieve(self, queries):
+        """
+        Retrieves documents for several queries with one embedding call and one FAISS search.
+
+        Returns:
+            A list with the selected documents of every query.
+        """
+
+        vectors = self.vector_store.embeddings.embed_documents(list(queries))
+        rows = dense_search_batch(self.vector_store, vectors, max(self.fetch_k, self.k))
+
+        return [self.select(vector, positions, self.k, self.lambda_mult) for vector, positions in zip(vectors, rows)]
+
+    def _get_relevant_documents(self, query, *, run_manager=None, k=None, fetch_k=None, lambda_mult=None):
+
+        vector = self.vector_store.embeddings.embed_query(query)
+        return self.search_by_vector(vector, k, fetch_k, lambda_mult)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing BM25 (sparse) and FAISS (dense) rankings.
+
+    Keyword-dominant queries (a few rare, indexed terms such as a drug name) are answered
+    from BM25 alone, skipping the query embedding call. Other queries are searched in both
+    indexes and the two rankings are merged with Reciprocal Rank Fusion.
+    """
+
+    vector_store: Any
+    bm25: Any
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    sparse_fast_path: bool = True
+    keyword_max_terms: int = 3
+    keyword_min_idf: float = 4.0
+
+    def is_keyword_query(self, query, sparse):
+        """Returns True if the query should be answered from BM25 alone."""
+
+        return self.sparse_fast_path and bool(sparse) and \
+            self.bm25.is_keyword_query(query, self.keyword_max_terms, self.keyword_min_idf)
+
+    def batch_retrieve(self, queries):
+        """
+        Retrieves documents for several queries.
+
+        Keyword queries are answered from BM25; the others are embedded in one call and
+        searched with one multi-query FAISS search before fusion.
+
+        Returns:
+            A list with the retrieved documents of every query.
+        """
+
+        sparse = [[position for position, _ in self.bm25.search(query, self.fetch_k)] for query in queries]
+        keyword = [self.is_keyword_query(query, ranking) for query, ranking in zip(queries, sparse)]
+
+        dense_queries = [query for query, is_keyword in zip(queries, keyword) if not is_keyword]
+        vectors = self.vector_store.embeddings.embed_documents(dense_queries) if dense_queries else []
+        dense = iter(dense_search_batch(self.vector_store, vectors, self.fetch_k) if vectors else [])
+
+        results = []
+        for ranking, is_keyword in zip(sparse, keyword):
+            positions = ranking if is_keyword else reciprocal_rank_fusion([next(dense), ranking], self.rrf_k)
+            results.append(documents_at(self.vector_store, positions[:self.k]))
+
+        return results
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+
+        sparse = [position for position, _ in self.bm25.search(query, self.fetch_k)]
+
+        if self.is_keyword_query(query, sparse):
+            logger.info(f"Sparse-only retrieval for keyword query '{query}'")
+            return documents_at(self.vector_store, sparse[:self.k])
+
+        dense = dense_search(self.vector_store, self.vector_store.embeddings.embed_query(query), self.fetch_k)
+        fused = reciprocal_rank_fusion([dense, sparse], self.rrf_k)
+        return documents_at(self.vector_store, fused[:self.k])
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+import faiss
+import numpy as np
+from app.config import RagConfig
+from app.vector_store import vector_store_fingerprint
+from app.log import logger
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the embedding of a standalone question.
+
+    Payloads (question, answer, vector) are persisted in SQLite and mirrored into a small
+    in-memory FAISS inner-product index over normalized vectors, so a lookup returns the
+    stored answer of the most similar question when its cosine similarity reaches the
+    threshold. The cache is cleared automatically when the main vector store is rebuilt.
+    """
+
+    def __init__(self, path, threshold, store_fingerprint, max_entries=50000):
+        """
+        Args:
+            path: Path of the SQLite payload file.
+            threshold: Minimum cosine similarity for a cache hit.
+            store_fingerprint: Fingerprint of the main vector store the answers were generated from.
+            max_entries: Maximum number of cached answers; new answers are not cached beyond it.
+        """
+
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self.index = None
+        self.last_id = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_answer (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS semantic_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        row = self.conn.execute("SELECT value FROM semantic_meta WHERE key = 'store_fingerprint'").fetchone()
+        if row is None or row[0] != store_fingerprint:
+            if row is not None:
+                logger.info("Vector store was rebuilt, invalidating the semantic answer cache.")
+            self.clear()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO semantic_meta (key, value) VALUES ('store_fingerprint', ?)",
+                (store_fingerprint,)
+            )
+
+    def clear(self):
+        """Removes every cached answer."""
+
+        with self.lock:
+            self.conn.execute("DELETE FROM semantic_answer")
+            self.index = None
+            self.last_id = 0
+
+    def normalize(self, vector):
+        """Returns the vector as a unit-length float32 row matrix."""
+
+        v = np.asarray(vector, dtype='float32').reshape(1, -1)
+        faiss.normalize_L2(v)
+        return v
+
+    def sync(self):
+        """Loads answers added since the last sync, including those written by other workers (caller holds the lock)."""
+
+        rows = self.conn.execute(
+            "SELECT id, vector FROM semantic_answer WHERE id > ? ORDER BY id", (self.last_id,)
+        ).fetchall()
+
+        if not rows:
+            return
+
+        ids = np.array([r[0] for r in rows], dtype='int64')
+        vectors = np.vstack([np.frombuffer(r[1], dtype='float32') for r in rows])
+
+        if self.index is None:
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vectors.shape[1]))
+
+        self.index.add_with_ids(vectors, ids)
+        self.last_id = int(ids[-1])
+
+    def lookup(self, vector):
+        """
+        Finds a cached answer for a question embedding.
+
+        Args:
+            vector: The embedding of the standalone question.
+
+        Returns:
+            The cached answer string, or None on a miss.
+        """
+
+        v = self.normalize(vector)
+
+        with self.lock:
+            self.sync()
+
+            if self.index is None or self.index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = self.index.search(v, 1)
+            if ids[0][0] == -1 or scores[0][0] < self.threshold:
+                self.misses += 1
+                return None
+
+            row = self.conn.execute("SELECT answer FROM semantic_answer WHERE id = ?", (int(ids[0][0]),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            logger.info(f"Semantic cache hit (similarity {scores[0][0]:.3f}, {self.hits} hits / {self.misses} misses)")
+            return row[0]
+
+    def add(self, vector, question, answer):
+        """
+        Stores an answer for a question embedding.
+
+        Args:
+            vector: The embedding of the standalone question.
+            question: The standalone question text.
+            answer: The generated answer.
+        """
+
+        v = self.normalize(vector)
+
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM semantic_answer").fetchone()[0]
+            if count >= self.max_entries:
+                return
+
+            self.conn.execute(
+                "INSERT INTO semantic_answer (question, answer, vector, created_at) VALUES (?, ?, ?, ?)",
+                (question, answer, v.tobytes(), time.time())
+            )
+            self.sync()
+
+
+def create_semantic_cache():
+    """
+    Creates the semantic answer cache if it is enabled in the configuration.
+
+    Returns:
+        A SemanticCache instance, or None if the cache is disabled.
+    """
+
+    if not RagConfig.SEMANTIC_CACHE_ENABLED:
+        return None
+
+    logger.info("Loading semantic answer cache...")
+    return SemanticCache(
+        RagConfig.SEMANTIC_CACHE_PATH,
+        threshold=RagConfig.SEMANTIC_CACHE_THRESHOLD,
+        store_fingerprint=vector_store_fingerprint(),
+        max_entries=RagConfig.SEMANTIC_CACHE_MAX_ENTRIES
+    )
@@ -1,43 +1,65 @@
-from langchain_community.vectorstores import FAISS
+import hashlib
 import os
-from langchain_mistralai import MistralAIEmbeddings
+from app.ann_index import configure_index
+from app.bm25 import BM25Index
+from app.docstore import has_chunk_store, has_legacy_store, open_vector_store
+from app.embeddings import check_embedding_meta, get_embedding_model
 from app.log import logger
 
 
-def load_vector_store():
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+EMBEDDINGS_DIR = os.path.join(ROOT_DIR, "vector DB", "embeddings")
+
+
+def vector_store_fingerprint():
+    """
+    Returns a fingerprint of the on-disk vector store files.
+
+    The fingerprint changes whenever the index is rebuilt, which lets caches derived
+    from the vector store detect that they are stale.
     """
-    Loads a FAISS vector store from disk using Mistral embeddings.
+    
+    parts = []
+    for name in sorted(os.listdir(EMBEDDINGS_DIR)) if os.path.exists(EMBEDDINGS_DIR) else []:
+        path = os.path.join(EMBEDDINGS_DIR, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+
+def load_vector_store(embedding_model=None):
+    """
+    Loads a FAISS vector store from disk using the configured embeddings.
+
+    The index is read into memory while the chunk texts stay in a memory-mapped store.
+
+    Args:
+        embedding_model: The embeddings model used to embed queries. Defaults to a plain
+            client of the configured provider; pass the cached model to avoid repeated network calls.
 
     Returns:
         vector_store: A FAISS vector store loaded with the given embeddings.
 
     Raises:
         FileNotFoundError: If the embeddings directory or index files do not exist.
+        RuntimeError: If the index was built with a different embedding provider or dimension.
     """
     
-    ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    EMBEDDINGS_DIR = os.path.join(ROOT_DIR, "vector DB", "embeddings")
-    
     if not os.path.exists(EMBEDDINGS_DIR):
         error_msg = f"Embeddings directory '{EMBEDDINGS_DIR}' does not exist. Please create it first."
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     
-    index_path = os.path.join(EMBEDDINGS_DIR, "index.faiss")
-    config_path = os.path.join(EMBEDDINGS_DIR, "index.pkl")
-
-    if os.path.exists(index_path) and os.path.exists(config_path):
-        embedding_model = MistralAIEmbeddings(
-            model='mistral-embed',
-            api_key=os.environ.get('MISTRAL_API_KEY'),
-            wait_time=2
-        )
+    if has_chunk_store(EMBEDDINGS_DIR) or has_legacy_store(EMBEDDINGS_DIR):
+        if embedding_model is None:
+            embedding_model = get_embedding_model()
         
-        vector_store = FAISS.load_local(
-            EMBEDDINGS_DIR,
-            embedding_model,
-            allow_dangerous_deserialization=True
-        )
+        # Chunks stay memory-mapped on disk and are only decoded for search results
+        vector_store = open_vector_store(EMBEDDINGS_DIR, embedding_model)
+        check_embedding_meta(EMBEDDINGS_DIR, vector_store.index.d)
+        configure_index(vector_store.index)
         
         logger.info("✅ FAISS vector store loaded from disk.")
         return vector_store
@@ -47,3 +69,19 @@ def load_vector_store():
         logger.error(error_msg)
         
         raise FileNotFoundError(error_msg)
+
+
+
+def load_bm25_index():
+    """
+    Loads the BM25 index built next to the FAISS index.
+
+    Returns:
+        A BM25Index, or None if the vector store was built without one.
+    """
+    
+    bm25 = BM25Index.load(EMBEDDINGS_DIR)
+    if bm25 is None:
+        logger.warning("⚠️ No BM25 index found next to the FAISS index, rebuild the vector store to enable hybrid retrieval.")
+    
+    return bm25
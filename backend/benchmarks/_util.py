@@ -0,0 +1,11 @@
+"""Helpers shared by the benchmark scripts."""
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values (in seconds), in milliseconds."""
+
+    if not values:
+        return 0.0
+
+    rank = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[rank] * 1000
@@ -0,0 +1,332 @@
+"""
+Offline end-to-end benchmark of the chat endpoints.
+
+Boots `create_app()` against a temporary SQLite database with the Mistral LLM and embedding
+model replaced by local stubs of configurable latency and token rate, then drives concurrent
+simulated users through `/chat/new` and `/chat/<id>`. Reports p50/p95/p99 latency per stage
+(rewrite, retrieval, generation, title, summary, db) and per endpoint, plus requests per second,
+so regressions in the Flask, SQLAlchemy and FAISS layers show up without network access.
+
+Usage (from the backend directory):
+    python benchmarks/bench_chat.py --users 8 --turns 4 --llm-latency 0.3 --token-rate 80
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from langchain_core.embeddings import Embeddings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from _util import percentile
+
+
+TOPICS = ['diabetes', 'asthma', 'hypertension', 'migraine', 'anemia', 'arthritis', 'influenza',
+          'pneumonia', 'eczema', 'hepatitis', 'malaria', 'tuberculosis', 'gout', 'psoriasis']
+ASPECTS = ['symptoms', 'causes', 'diagnosis', 'treatment', 'prognosis', 'prevention', 'risk factors']
+FILLER = ['patients', 'may', 'experience', 'chronic', 'acute', 'therapy', 'doctor', 'blood', 'pain',
+          'fever', 'medication', 'infection', 'inflammation', 'tests', 'common', 'severe', 'mild']
+
+
+class StageRecorder:
+    """Thread-safe collector of latency samples per stage."""
+
+    def __init__(self):
+
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def report(self, wall_time, requests):
+        """Prints the latency percentiles of every stage and the overall throughput."""
+
+        print(f"\n{'stage':<22}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        with self.lock:
+            for stage in sorted(self.samples):
+                values = sorted(self.samples[stage])
+                print(f"{stage:<22}{len(values):>8}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                      f"{percentile(values, 99):>10.1f}{values[-1] * 1000:>10.1f}")
+
+        print(f"\n{requests} chat requests in {wall_time:.2f}s -> {requests / wall_time:.2f} req/s")
+
+
+class StubLLM:
+    """Stand-in for RagLLM that sleeps for a fixed latency plus output tokens / token rate."""
+
+    def __init__(self, recorder, latency, token_rate, answer_tokens):
+
+        from app.rate_limit import Priority
+
+        self.recorder = recorder
+        self.latency = latency
+        self.token_rate = token_rate
+        self.stages = {Priority.ANSWER: ('generation', answer_tokens), Priority.REWRITE: ('rewrite', 24),
+                       Priority.TITLE: ('title', 5), Priority.SUMMARY: ('summary_llm', 200)}
+
+    def output(self, prompt, tokens):
+
+        if 'Reply with only "Yes" or "No"' in prompt:
+            return "Yes"
+
+        return " ".join(random.choice(FILLER) for _ in range(tokens))
+
+    def invoke(self, prompt, priority=0):
+
+        stage, tokens = self.stages.get(priority, ('generation', 100))
+        with self.recorder.measure(stage):
+            time.sleep(self.latency + tokens / self.token_rate)
+
+        return SimpleNamespace(content=self.output(prompt, tokens))
+
+    def stream(self, prompt, priority=0):
+
+        stage, tokens = self.stages.get(priority, ('generation', 100))
+        with self.recorder.measure(stage):
+            time.sleep(self.latency)
+            for word in self.output(prompt, tokens).split(" "):
+                time.sleep(1 / self.token_rate)
+                yield SimpleNamespace(content=word + " ")
+
+
+class StubEmbeddings(Embeddings):
+    """Local hashing embeddings with a simulated network latency per call."""
+
+    def __init__(self, latency, dimension=1024):
+
+        from app.embeddings import HashingEmbeddings
+
+        self.embeddings = HashingEmbeddings(dimension=dimension)
+        self.latency = latency
+
+    def embed_query(self, text):
+
+        time.sleep(self.latency)
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts):
+
+        time.sleep(self.latency)
+        return self.embeddings.embed_documents(texts)
+
+
+class TimedRetriever:
+    """Proxy that records the latency of every retrieval."""
+
+    def __init__(self, retriever, recorder):
+
+        self.retriever = retriever
+        self.recorder = recorder
+
+    def get_relevant_documents(self, query):
+
+        with self.recorder.measure('retrieval'):
+            return self.retriever.get_relevant_documents(query)
+
+    def __getattr__(self, name):
+
+        return getattr(self.retriever, name)
+
+
+def synthetic_corpus(size):
+    """Generates encyclopedia-like chunks about a fixed set of conditions."""
+
+    rng = random.Random(42)
+    docs = []
+    for i in range(size):
+        topic, aspect = rng.choice(TOPICS), rng.choice(ASPECTS)
+        words = " ".join(rng.choice(FILLER) for _ in range(70))
+        docs.append(f"{topic.title()} {aspect}: {words} {topic} {aspect}.")
+
+    return docs
+
+
+def install_stubs(args, recorder):
+    """Replaces the RAG pipeline construction with local stubs before the app imports it."""
+
+    import app.llm
+    from app.bm25 import BM25Index
+    from langchain_community.vectorstores import FAISS
+
+    def initialize_stub_pipeline():
+        embedding_model = StubEmbeddings(args.embed_latency)
+        corpus = synthetic_corpus(args.docs)
+        vector_store = FAISS.from_texts(corpus, embedding_model)
+        retriever = TimedRetriever(app.llm.create_retriever(vector_store, BM25Index.build(corpus)), recorder)
+        llm_model = StubLLM(recorder, args.llm_latency, args.token_rate, args.answer_tokens)
+
+        return llm_model, embedding_model, vector_store, retriever
+
+    app.llm.initialize_rag_pipeline = initialize_stub_pipeline
+
+
+def install_db_timing(recorder):
+    """Records the duration of every SQL statement as the 'db' stage."""
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        recorder.record('db', time.perf_counter() - conn.info['query_start'].pop())
+
+
+def sse_events(body):
+    """Parses a Server-Sent Events body into a list of (event, data) tuples."""
+
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line)
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines.get('data', 'null'))))
+
+    return events
+
+
+def post_json(client, url, payload):
+    """POSTs JSON with the CSRF header expected for cookie-based JWTs."""
+
+    cookie = client.get_cookie('csrf_access_token')
+    headers = {'X-CSRF-TOKEN': cookie.value} if cookie else {}
+    return client.post(url, json=payload, headers=headers)
+
+
+def simulate_user(flask_app, user_no, args, recorder, errors):
+    """Registers a user, logs in and runs a few chats of several turns each."""
+
+    client = flask_app.test_client()
+    email = f"bench{user_no}@example.com"
+
+    client.post('/user/register', json={'email': email, 'name': f"Bench User {user_no}"})
+    client.post('/auth/login', json={'email': email})
+
+    rng = random.Random(user_no)
+    new_url, chat_url = ('/chat/new/stream', '/chat/{}/stream') if args.stream else ('/chat/new', '/chat/{}')
+
+    for _ in range(args.chats):
+        topic = rng.choice(TOPICS)
+
+        with recorder.measure(f"POST {new_url}"):
+            response = post_json(client, new_url, {'query': f"What are the {rng.choice(ASPECTS)} of {topic}?"})
+            body = response.get_data(as_text=True)
+
+        if response.status_code != 201 and not (args.stream and response.status_code == 200):
+            errors.append(f"{new_url}: {response.status_code} {body[:200]}")
+            continue
+
+        chat_id = response.get_json()['chat_id'] if not args.stream else \
+            dict(sse_events(body))['chat']['chat_id']
+
+        for _ in range(args.turns):
+            with recorder.measure(f"POST {chat_url.format('<id>')}"):
+                response = post_json(client, chat_url.format(chat_id), {'query': f"And what about {rng.choice(ASPECTS)}?"})
+                response.get_data()
+
+            if response.status_code != 200:
+                errors.append(f"{chat_url}: {response.status_code}")
+
+
+def wait_for_summaries(flask_app, timeout):
+    """Waits until the background summary queue is drained (or the timeout expires)."""
+
+    from app.models import SummaryJob
+
+    deadline = time.time() + timeout
+    with flask_app.app_context():
+        while time.time() < deadline and SummaryJob.query.count() > 0:
+            time.sleep(0.2)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=8, help='concurrent simulated users')
+    parser.add_argument('--chats', type=int, default=2, help='chats started per user')
+    parser.add_argument('--turns', type=int, default=4, help='follow-up turns per chat')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='stub LLM latency before the first token (s)')
+    parser.add_argument('--token-rate', type=float, default=80.0, help='stub LLM output tokens per second')
+    parser.add_argument('--answer-tokens', type=int, default=250, help='tokens per generated answer')
+    parser.add_argument('--embed-latency', type=float, default=0.05, help='stub embedding call latency (s)')
+    parser.add_argument('--docs', type=int, default=2000, help='synthetic chunks in the FAISS index')
+    parser.add_argument('--stream', action='store_true', help='use the SSE streaming endpoints')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rag-bench-')
+    os.chdir(workdir)
+    os.environ.setdefault('SECRET_KEY', 'bench-secret')
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret')
+
+    from app.config import AppConfig, RagConfig
+    AppConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    RagConfig.SEMANTIC_CACHE_ENABLED = False
+
+    recorder = StageRecorder()
+    install_stubs(args, recorder)
+    install_db_timing(recorder)
+
+    from app import create_app
+    import app.jobs
+    import app.pipeline
+
+    generate_summary = app.jobs.generate_summary
+
+    def timed_summary(chat):
+        with recorder.measure('summary'):
+            return generate_summary(chat)
+
+    app.jobs.generate_summary = timed_summary
+
+    flask_app = create_app()
+    if not app.pipeline.pipeline.wait():
+        sys.exit(f"RAG pipeline failed to load: {app.pipeline.pipeline.error}")
+    recorder.samples.clear()
+
+    print(f"Benchmarking {args.users} users x {args.chats} chats x (1 + {args.turns}) turns in {workdir}")
+
+    errors = []
+    threads = [threading.Thread(target=simulate_user, args=(flask_app, i, args, recorder, errors))
+               for i in range(args.users)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_time = time.perf_counter() - start
+
+    wait_for_summaries(flask_app, timeout=60)
+
+    requests = args.users * args.chats * (1 + args.turns)
+    recorder.report(wall_time, requests)
+
+    if errors:
+        print(f"\n{len(errors)} errors, first: {errors[0]}")
+
+
+if __name__ == '__main__':
+    main()
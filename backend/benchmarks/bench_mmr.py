@@ -0,0 +1,108 @@
+"""
+Microbenchmark of MMR retrieval: LangChain's FAISS MMR search vs our vectorized MMRRetriever.
+
+Runs both on the same query vectors (no embedding calls) over the on-disk index in
+`vector DB/embeddings`, or over a synthetic index of random unit vectors when there is
+none (or with --synthetic). Queries are held-out midpoints of stored vectors. Reports
+mean / p50 / p95 latency per query and how often both paths select the same chunks.
+
+Usage (from the backend directory):
+    python benchmarks/bench_mmr.py --queries 500 --k 5 --fetch-k 20 --lambda-mult 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from _util import percentile
+
+
+def synthetic_store(size, dimension):
+    """Builds an in-memory FAISS store of random unit vectors."""
+
+    from langchain_community.vectorstores import FAISS
+    from app.embeddings import HashingEmbeddings
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(size, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return FAISS.from_embeddings([(f"chunk {i}", v.tolist()) for i, v in enumerate(vectors)],
+                                 HashingEmbeddings(dimension))
+
+
+def load_store():
+    """Opens the on-disk vector store (queries are passed as vectors, so no embedding model is needed)."""
+
+    from app.ann_index import configure_index
+    from app.docstore import open_vector_store
+    from app.embeddings import HashingEmbeddings
+    from app.vector_store import EMBEDDINGS_DIR
+
+    vector_store = open_vector_store(EMBEDDINGS_DIR, HashingEmbeddings())
+    configure_index(vector_store.index)
+    return vector_store
+
+
+def run(label, search, queries):
+    """Times a search function over all queries and prints its latency distribution."""
+
+    durations = []
+    results = []
+    for vector in queries:
+        start = time.perf_counter()
+        docs = search(vector)
+        durations.append(time.perf_counter() - start)
+        results.append([doc.page_content for doc in docs])
+
+    durations.sort()
+    print(f"{label:<12} mean {np.mean(durations) * 1000:8.3f} ms   p50 {percentile(durations, 50):8.3f} ms   "
+          f"p95 {percentile(durations, 95):8.3f} ms")
+    return results, float(np.mean(durations))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500, help='held-out query vectors')
+    parser.add_argument('--k', type=int, default=5, help='documents returned per query')
+    parser.add_argument('--fetch-k', type=int, default=20, help='candidates fetched before MMR')
+    parser.add_argument('--lambda-mult', type=float, default=0.5, help='MMR relevance weight')
+    parser.add_argument('--synthetic', type=int, default=0, help='use a synthetic index of this many vectors')
+    parser.add_argument('--dimension', type=int, default=1024, help='dimension of the synthetic vectors')
+    args = parser.parse_args()
+
+    from app.ann_index import held_out_queries, index_vectors
+    from app.docstore import has_chunk_store, has_legacy_store
+    from app.retrievers import MMRRetriever
+    from app.vector_store import EMBEDDINGS_DIR
+
+    if args.synthetic or not (has_chunk_store(EMBEDDINGS_DIR) or has_legacy_store(EMBEDDINGS_DIR)):
+        size = args.synthetic or 20000
+        print(f"Synthetic index: {size} x {args.dimension}")
+        vector_store = synthetic_store(size, args.dimension)
+    else:
+        print(f"Index: {EMBEDDINGS_DIR}")
+        vector_store = load_store()
+
+    queries = held_out_queries(index_vectors(vector_store.index), args.queries)
+    retriever = MMRRetriever(vector_store=vector_store, k=args.k, fetch_k=args.fetch_k, lambda_mult=args.lambda_mult)
+
+    print(f"{len(queries)} queries, {vector_store.index.ntotal} vectors, "
+          f"k={args.k} fetch_k={args.fetch_k} lambda={args.lambda_mult}\n")
+
+    langchain_results, langchain_mean = run('langchain', lambda v: vector_store.max_marginal_relevance_search_by_vector(
+        v.tolist(), k=args.k, fetch_k=args.fetch_k, lambda_mult=args.lambda_mult), queries)
+    numpy_results, numpy_mean = run('vectorized', retriever.search_by_vector, queries)
+
+    same = np.mean([set(a) == set(b) for a, b in zip(langchain_results, numpy_results)])
+    print(f"\nspeedup {langchain_mean / numpy_mean:.2f}x, identical selections {same:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VECTOR_DB_DIR = os.path.join(os.path.dirname(BACKEND_DIR), 'vector DB')
+
+for path in (BACKEND_DIR, VECTOR_DB_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Configuration is read at import time, so the test database is set up before importing the app
+TEST_DIR = tempfile.mkdtemp(prefix='rag-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    'MIGRATIONS_MODE': 'off',
+    'PIPELINE_WARMUP': 'false',
+    'SECRET_KEY': 'test-secret',
+    'JWT_SECRET_KEY': 'test-jwt-secret'
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+
+    return create_app()
+
+
+@pytest.fixture
+def db_session(app):
+    """An app context with empty tables."""
+
+    from app import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db.session
+        db.session.remove()
@@ -0,0 +1,75 @@
+import httpx
+from langchain_mistralai.embeddings import MistralAIEmbeddings
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from app.rate_limit import retry_after_seconds, status_code
+from vector_ops import batching
+
+
+def rate_limited_embeddings(limited_calls):
+    """Mistral embeddings whose first `limited_calls` requests are answered with a 429."""
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= limited_calls:
+            return httpx.Response(429, headers={'Retry-After': '0'}, json={'message': 'rate limited'})
+
+        texts = httpx.Response(200, content=request.content).json()['input']
+        return httpx.Response(200, json={'data': [{'embedding': [float(len(t)), 1.0]} for t in texts]})
+
+    client = httpx.Client(base_url='https://api.mistral.ai/v1', transport=httpx.MockTransport(handler))
+    model = MistralAIEmbeddings(api_key='test', client=client, tokenizer=Tokenizer(WordLevel({'[UNK]': 0}, unk_token='[UNK]')),
+                                max_retries=1, wait_time=0)
+
+    return model, calls
+
+
+def test_status_code_unwraps_retry_error():
+    model, _ = rate_limited_embeddings(limited_calls=1)
+
+    try:
+        model.embed_documents(['aspirin'])
+    except Exception as e:
+        error = e
+
+    assert type(error).__name__ == 'RetryError'
+    assert status_code(error) == 429
+    assert retry_after_seconds(error) == 0.0
+
+
+def test_embed_concurrently_backs_off_on_wrapped_429(monkeypatch):
+    monkeypatch.setattr(batching, 'MAX_BATCH_ATTEMPTS', 1)
+    model, calls = rate_limited_embeddings(limited_calls=2)
+
+    keys = [f"chunk-{i}" for i in range(20)]
+    text_by_key = {k: k * 2 for k in keys}
+    embedded = {}
+
+    stats = batching.embed_concurrently(model, keys, text_by_key,
+                                        lambda batch, vectors: embedded.update(zip(batch, vectors)), batch_size=8)
+
+    # Rate limiting goes through the AIMD back-off instead of using up the failure attempts
+    assert stats['rate_limited'] == 2
+    assert stats['embedded'] == len(keys)
+    assert embedded['chunk-3'] == [float(len(text_by_key['chunk-3'])), 1.0]
+    assert len(calls) > 2
+
+
+def test_embed_concurrently_counts_attempts_per_key(monkeypatch):
+    monkeypatch.setattr(batching, 'RETRY_BASE_DELAY', 0.01)
+    failures = []
+
+    class FlakyEmbeddings:
+        def embed_documents(self, texts):
+            if len(failures) < batching.MAX_BATCH_ATTEMPTS - 1:
+                failures.append(texts)
+                raise ConnectionError('connection reset')
+            return [[1.0] for _ in texts]
+
+    keys = [f"chunk-{i}" for i in range(4)]
+    stats = batching.embed_concurrently(FlakyEmbeddings(), keys, {k: k for k in keys}, lambda *_: None)
+
+    assert stats['embedded'] == len(keys)
+    assert len(failures) == batching.MAX_BATCH_ATTEMPTS - 1
@@ -0,0 +1,44 @@
+import numpy as np
+from app.bm25 import BM25_FILE, BM25Index
+
+TEXTS = [
+    "Ibuprofen relieves pain and fever.",
+    "Paracetamol is used for fever in children.",
+    "Café-au-lait spots are a sign of neurofibromatosis, " + "x" * 300
+]
+
+
+def test_search_ranks_chunks_with_rare_terms_first():
+    index = BM25Index.build(TEXTS)
+
+    results = index.search("ibuprofen fever", k=3)
+
+    assert [position for position, _ in results] == [0, 1]
+
+
+def test_vocabulary_is_saved_as_a_byte_blob(tmp_path):
+    index = BM25Index.build(TEXTS)
+    index.save(str(tmp_path))
+
+    with np.load(tmp_path / BM25_FILE) as data:
+        assert 'vocab' not in data
+        assert data['terms'].dtype == np.uint8
+        # One byte per character, rather than 4 bytes times the longest (300 character) term for every term
+        assert data['terms'].nbytes == sum(len(t.encode('utf-8')) for t in index.term_ids)
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded.term_ids == index.term_ids
+    assert loaded.search("neurofibromatosis spots", k=3) == index.search("neurofibromatosis spots", k=3)
+
+
+def test_indexes_with_a_string_vocabulary_still_load(tmp_path):
+    index = BM25Index.build(TEXTS)
+    vocab = np.array(sorted(index.term_ids, key=index.term_ids.get), dtype=str)
+    np.savez(tmp_path / BM25_FILE, vocab=vocab, offsets=index.offsets, docs=index.docs, tfs=index.tfs,
+             doc_lengths=index.doc_lengths, params=np.array([index.k1, index.b], dtype='float32'))
+
+    loaded = BM25Index.load(str(tmp_path))
+
+    assert loaded.vocab_size == index.vocab_size
+    assert loaded.search("paracetamol", k=3) == index.search("paracetamol", k=3)
@@ -0,0 +1,109 @@
+from flask_jwt_extended import create_access_token, get_csrf_token
+from app.api import chats
+from app.context import ChatContext, add_message
+from app.models import Chat, User
+from app.pipeline import pipeline
+
+
+def authenticated_client(app, db_session):
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    token = create_access_token(identity=str(user.id))
+
+    client = app.test_client()
+    client.set_cookie('access_token_cookie', token)
+
+    return client, user, {'X-CSRF-TOKEN': get_csrf_token(token)}
+
+
+def ready_pipeline(monkeypatch):
+    monkeypatch.setattr(pipeline, 'state', 'ready')
+    monkeypatch.setattr(chats, 'start_workers', lambda app: None)
+    monkeypatch.setattr(chats, 'get_title', lambda query: 'Ibuprofen')
+
+
+def test_unauthenticated_chat_request_is_rejected_before_warm_up(app, db_session, monkeypatch):
+    started = []
+    monkeypatch.setattr(pipeline, 'start', lambda: started.append(True))
+
+    response = app.test_client().post('/chat/new', json={'query': 'What is ibuprofen?'})
+
+    assert response.status_code == 401
+    assert started == []
+
+
+def test_authenticated_chat_request_waits_for_the_pipeline(app, db_session, monkeypatch):
+    started = []
+    monkeypatch.setattr(pipeline, 'start', lambda: started.append(True))
+
+    client, _, headers = authenticated_client(app, db_session)
+    response = client.post('/chat/new', json={'query': 'What is ibuprofen?'}, headers=headers)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert started == [True]
+
+
+def test_failed_first_answer_leaves_no_chat(app, db_session, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('LLM unavailable')
+
+    ready_pipeline(monkeypatch)
+    monkeypatch.setattr(chats, 'get_rag_reply_v2', fail)
+    monkeypatch.setattr(chats, 'stream_rag_reply', fail)
+    client, user, headers = authenticated_client(app, db_session)
+
+    response = client.post('/chat/new', json={'query': 'What is ibuprofen?'}, headers=headers)
+    assert response.status_code == 500
+    assert Chat.query.filter_by(user_id=user.id).count() == 0
+
+    response = client.post('/chat/new/stream', json={'query': 'What is ibuprofen?'}, headers=headers)
+    body = response.get_data(as_text=True)
+    assert 'event: error' in body
+    assert 'event: title' not in body
+    assert Chat.query.filter_by(user_id=user.id).count() == 0
+
+
+def test_disconnect_after_the_answer_is_stored_keeps_the_chat(app, db_session, monkeypatch):
+    ready_pipeline(monkeypatch)
+    monkeypatch.setattr(chats, 'stream_rag_reply', lambda query, context: iter(['Take ', 'with food.']))
+    client, user, headers = authenticated_client(app, db_session)
+
+    response = client.post('/chat/new/stream', json={'query': 'What is ibuprofen?'}, headers=headers, buffered=False)
+    for frame in response.response:
+        if b'event: done' in frame:
+            break
+    # The client goes away while the final event is being sent
+    response.close()
+
+    chat = Chat.query.filter_by(user_id=user.id).one()
+    assert chat.message_count == 1
+
+
+def test_failed_stream_does_not_enqueue_a_summary(app, db_session, monkeypatch):
+    def fail(query, context):
+        raise RuntimeError('LLM unavailable')
+        yield
+
+    ready_pipeline(monkeypatch)
+    enqueued = []
+    monkeypatch.setattr(chats, 'enqueue_summary', enqueued.append)
+    client, user, headers = authenticated_client(app, db_session)
+
+    chat = Chat(user_id=user.id, title='Ibuprofen')
+    db_session.add(chat)
+    db_session.commit()
+    context = ChatContext.new(chat)
+    for i in range(4):
+        add_message(context, f"question {i}", f"answer {i}")
+
+    monkeypatch.setattr(chats, 'stream_rag_reply', fail)
+    body = client.post(f"/chat/{chat.id}/stream", json={'query': 'And the dosage?'}, headers=headers).get_data(as_text=True)
+    assert 'event: error' in body
+    assert enqueued == []
+
+    monkeypatch.setattr(chats, 'stream_rag_reply', lambda query, context: iter(['Twice a day.']))
+    body = client.post(f"/chat/{chat.id}/stream", json={'query': 'And the dosage?'}, headers=headers).get_data(as_text=True)
+    assert 'event: done' in body
+    assert enqueued == [chat.id]
@@ -0,0 +1,40 @@
+from app import db, sync_message_counts
+from app.context import ChatContext, add_message, load_chat_context, message_counts_stale
+from app.models import Chat, ShortTermMemory, User
+
+
+def create_chat(db_session):
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    chat = Chat(user_id=user.id, title='Headaches')
+    db_session.add(chat)
+    db_session.commit()
+
+    return chat
+
+
+def test_load_chat_context_returns_the_recent_turns(db_session):
+    chat = create_chat(db_session)
+    context = ChatContext.new(chat)
+    for i in range(5):
+        add_message(context, f"question {i}", f"answer {i}")
+
+    loaded = load_chat_context(chat.id)
+
+    assert loaded.message_count == 5
+    assert [m.question for m in loaded.recent_messages] == ['question 2', 'question 3', 'question 4']
+
+
+def test_message_counts_are_backfilled_after_migrations(app, db_session):
+    chat = create_chat(db_session)
+    # Messages stored before the counter column existed
+    db_session.add_all([ShortTermMemory(chat_id=chat.id, question=f"q{i}", answer=f"a{i}") for i in range(4)])
+    db_session.commit()
+    assert message_counts_stale()
+
+    sync_message_counts(app)
+
+    db_session.expire_all()
+    assert db.session.get(Chat, chat.id).message_count == 4
+    assert not message_counts_stale()
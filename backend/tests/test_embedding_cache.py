@@ -0,0 +1,91 @@
+import time
+from app.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings:
+    """Embeddings model that records the queries it is asked to embed."""
+
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), 1.0]
+
+
+def cached(tmp_path, **kwargs):
+    provider = CountingEmbeddings()
+    return CachedEmbeddings(provider, 'test-model', str(tmp_path / 'cache.db'), **kwargs), provider
+
+
+def test_repeated_query_is_served_without_a_provider_call(tmp_path):
+    cache, provider = cached(tmp_path)
+
+    first = cache.embed_query("What is ibuprofen?")
+    second = cache.embed_query("  what IS   ibuprofen? ")
+
+    assert second == first
+    assert provider.queries == ["What is ibuprofen?"]
+    assert cache.stats()['memory_hits'] == 1
+
+
+def test_other_workers_hit_the_disk_cache(tmp_path):
+    cache, _ = cached(tmp_path)
+    vector = cache.embed_query("What is ibuprofen?")
+
+    other, provider = cached(tmp_path)
+
+    assert other.embed_query("What is ibuprofen?") == vector
+    assert provider.queries == []
+    assert other.stats()['disk_hits'] == 1
+
+
+def test_model_name_is_part_of_the_key(tmp_path):
+    cache, _ = cached(tmp_path)
+    cache.embed_query("What is ibuprofen?")
+
+    provider = CountingEmbeddings()
+    other = CachedEmbeddings(provider, 'other-model', str(tmp_path / 'cache.db'))
+    other.embed_query("What is ibuprofen?")
+
+    assert provider.queries == ["What is ibuprofen?"]
+
+
+def test_least_recently_used_entries_are_evicted_from_memory(tmp_path):
+    cache, _ = cached(tmp_path, memory_size=2)
+    keys = [cache.cache_key(q) for q in ("a", "b", "c")]
+
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")
+    cache.embed_query("c")
+
+    assert list(cache.memory) == [keys[0], keys[2]]
+
+
+def test_disk_is_trimmed_to_max_rows_by_last_access(tmp_path):
+    cache, _ = cached(tmp_path, max_rows=2)
+    for query in ("a", "b", "c"):
+        cache.embed_query(query)
+        time.sleep(0.01)
+    cache.memory.clear()
+    cache.embed_query("a")
+
+    cache.evict()
+
+    rows = {key for key, in cache.conn.execute("SELECT key FROM query_embedding")}
+    assert rows == {cache.cache_key("a"), cache.cache_key("c")}
+
+
+def test_expired_entries_are_embedded_again(tmp_path):
+    cache, provider = cached(tmp_path, ttl=60)
+    cache.embed_query("What is ibuprofen?")
+    key = cache.cache_key("What is ibuprofen?")
+    cache.memory[key] = (cache.memory[key][0], time.time() - 120)
+    cache.conn.execute("UPDATE query_embedding SET created_at = ?", (time.time() - 120,))
+
+    cache.embed_query("What is ibuprofen?")
+
+    assert len(provider.queries) == 2
+    cache.evict()
+    assert cache.stats()['disk_entries'] == 1
@@ -0,0 +1,25 @@
+from app import embeddings
+from app.config import RagConfig
+
+
+def test_hashing_cache_key_depends_on_the_dimension(monkeypatch):
+    monkeypatch.setattr(RagConfig, 'EMBEDDING_PROVIDER', 'hashing')
+
+    monkeypatch.setattr(RagConfig, 'HASHING_EMBEDDING_DIM', 256)
+    small = embeddings.embedding_model_name()
+    monkeypatch.setattr(RagConfig, 'HASHING_EMBEDDING_DIM', 1024)
+
+    assert small != embeddings.embedding_model_name()
+
+
+def test_onnx_cache_key_depends_on_the_model_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(RagConfig, 'EMBEDDING_PROVIDER', 'onnx')
+    monkeypatch.setattr(RagConfig, 'ONNX_MODEL_DIR', str(tmp_path))
+    (tmp_path / 'tokenizer.json').write_text('{}')
+
+    (tmp_path / 'model.onnx').write_bytes(b'model v1')
+    first = embeddings.embedding_model_name()
+    (tmp_path / 'model.onnx').write_bytes(b'model v2, retrained')
+
+    assert first.startswith(f"onnx:{tmp_path.name}@")
+    assert first != embeddings.embedding_model_name()
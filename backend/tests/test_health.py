@@ -0,0 +1,12 @@
+from app.pipeline import pipeline
+
+
+def test_readyz_starts_the_pipeline(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(pipeline, 'start', lambda: started.append(True))
+
+    response = app.test_client().get('/readyz')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert started == [True]
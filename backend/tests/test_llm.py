@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessageChunk
+from langchain_mistralai import ChatMistralAI
+from app.config import RagConfig
+from app.llm import RagLLM
+from app.rate_limit import Priority
+
+
+def test_stream_priority_does_not_outlive_the_first_chunk(tmp_path, monkeypatch):
+    monkeypatch.setenv('MISTRAL_API_KEY', 'test')
+    monkeypatch.setattr(RagConfig, 'RATE_LIMIT_PATH', str(tmp_path / 'rate_limit.db'))
+    acquired_with = []
+
+    def fake_stream(self, prompt):
+        acquired_with.append(getattr(self.rate_limiter.local, 'priority', Priority.ANSWER))
+        for token in ('Take ', 'with ', 'food.'):
+            yield AIMessageChunk(content=token)
+
+    monkeypatch.setattr(ChatMistralAI, 'stream', fake_stream)
+    llm = RagLLM()
+
+    chunks = llm.stream('How should I take ibuprofen?', priority=Priority.BATCH)
+    assert next(chunks).content == 'Take '
+
+    # Between chunks the thread is back to its default priority
+    assert getattr(llm.rate_limiter.local, 'priority', Priority.ANSWER) == Priority.ANSWER
+    assert [chunk.content for chunk in chunks] == ['with ', 'food.']
+    assert acquired_with == [Priority.BATCH]
@@ -0,0 +1,62 @@
+import pytest
+from pypdf import PdfWriter
+from vector_ops import loader
+
+
+def write_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("the PDF should not be read")
+
+
+def test_cached_document_is_not_hashed_or_opened(tmp_path, monkeypatch):
+    pdf_path = str(tmp_path / 'book.pdf')
+    write_pdf(pdf_path, 4)
+    store = loader.PageStore(str(tmp_path / 'pages.db'))
+
+    first = loader.load_pages(pdf_path, 1, 10, workers=1, store=store)
+
+    monkeypatch.setattr(loader, 'PdfReader', fail)
+    monkeypatch.setattr(loader, 'file_hash', fail)
+    second = loader.load_pages(pdf_path, 1, 10, workers=1, store=store)
+
+    assert [d.metadata for d in second] == [d.metadata for d in first]
+    assert [d.metadata['page'] for d in second] == [1, 2, 3]
+    assert {d.metadata['total_pages'] for d in second} == {4}
+
+
+def test_changed_document_is_described_again(tmp_path):
+    pdf_path = str(tmp_path / 'book.pdf')
+    write_pdf(pdf_path, 2)
+    store = loader.PageStore(str(tmp_path / 'pages.db'))
+    pdf_hash, page_count = store.describe(pdf_path)
+
+    write_pdf(pdf_path, 3)
+
+    assert page_count == 2
+    assert store.describe(pdf_path) == (loader.file_hash(pdf_path), 3)
+    assert store.describe(pdf_path)[0] != pdf_hash
+
+
+def test_moved_document_reuses_its_page_count(tmp_path, monkeypatch):
+    write_pdf(str(tmp_path / 'book.pdf'), 2)
+    store = loader.PageStore(str(tmp_path / 'pages.db'))
+    described = store.describe(str(tmp_path / 'book.pdf'))
+
+    (tmp_path / 'book.pdf').rename(tmp_path / 'moved.pdf')
+    monkeypatch.setattr(loader, 'PdfReader', fail)
+
+    assert store.describe(str(tmp_path / 'moved.pdf')) == described
+
+
+def test_missing_document_raises(tmp_path):
+    store = loader.PageStore(str(tmp_path / 'pages.db'))
+
+    with pytest.raises(FileNotFoundError):
+        store.describe(str(tmp_path / 'missing.pdf'))
@@ -0,0 +1,106 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+from app.models import Chat, ShortTermMemory, User
+from app.pagination import keyset_page, page_args
+from test_chats import authenticated_client
+
+
+def create_chats(db_session, user, count):
+    # Added in one commit, so every row is stored at the same moment with the same title
+    db_session.add_all([Chat(user_id=user.id, title='Headaches') for _ in range(count)])
+    db_session.commit()
+
+
+def all_pages(query, column, limit):
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, column, cursor, limit)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_page_args_defaults_and_caps_the_limit():
+    assert page_args(MultiDict(), 20, 100) == (None, 20)
+    assert page_args(MultiDict({'cursor': '42', 'limit': '5'}), 20, 100) == (42, 5)
+    assert page_args(MultiDict({'limit': '500'}), 20, 100) == (None, 100)
+    assert page_args(MultiDict({'cursor': ''}), 20, 100) == (None, 20)
+
+
+@pytest.mark.parametrize('args', [
+    {'cursor': 'abc'},
+    {'cursor': '1.5'},
+    {'limit': 'ten'},
+    {'cursor': '0'},
+    {'cursor': '-3'},
+    {'limit': '0'},
+    {'limit': '-1'}
+])
+def test_page_args_rejects_invalid_values(args):
+    with pytest.raises(ValueError):
+        page_args(MultiDict(args), 20, 100)
+
+
+def test_keyset_pages_round_trip_without_gaps_or_duplicates(db_session):
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    create_chats(db_session, user, 7)
+    ids = sorted((chat.id for chat in Chat.query.all()), reverse=True)
+
+    pages = all_pages(Chat.query.filter_by(user_id=user.id), Chat.id, 3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [i for page in pages for i in page] == ids
+
+
+def test_keyset_last_full_page_has_no_next_cursor(db_session):
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    create_chats(db_session, user, 6)
+
+    pages = all_pages(Chat.query.filter_by(user_id=user.id), Chat.id, 3)
+
+    assert [len(page) for page in pages] == [3, 3]
+
+
+def test_rows_stored_together_are_split_by_the_primary_key(db_session):
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    create_chats(db_session, user, 1)
+    chat = Chat.query.one()
+    db_session.add_all([ShortTermMemory(chat_id=chat.id, question='same', answer='same') for _ in range(5)])
+    db_session.commit()
+
+    first = chat.messages_page(limit=2)
+    second = chat.messages_page(first['next_cursor'], 2)
+    third = chat.messages_page(second['next_cursor'], 2)
+
+    ids = [m['message_id'] for page in (third, second, first) for m in page['messages']]
+    assert ids == sorted(m.id for m in ShortTermMemory.query.all())
+    assert third['next_cursor'] is None
+
+
+def test_chat_routes_follow_the_cursor(app, db_session):
+    client, user, headers = authenticated_client(app, db_session)
+    create_chats(db_session, user, 3)
+
+    first = client.get('/user/chats?limit=2', headers=headers).get_json()
+    second = client.get(f"/user/chats?limit=2&cursor={first['next_cursor']}", headers=headers).get_json()
+
+    assert len(first['chats']) == 2
+    assert len(second['chats']) == 1
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('query', ['cursor=abc', 'cursor=0', 'limit=-1'])
+def test_chat_routes_reject_invalid_cursors(app, db_session, query):
+    client, user, headers = authenticated_client(app, db_session)
+    create_chats(db_session, user, 1)
+    chat_id = Chat.query.one().id
+
+    assert client.get(f"/user/chats?{query}", headers=headers).status_code == 400
+    assert client.get(f"/chat/{chat_id}/messages?{query}", headers=headers).status_code == 400
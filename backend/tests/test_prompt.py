@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+import pytest
+from langchain_core.documents import Document
+from app import prompt
+from app.prompt import PromptBudget, count_tokens, turn_tokens
+
+
+@pytest.fixture(params=['estimate', 'tiktoken'])
+def tokenizer(request, monkeypatch):
+    """Counts tokens with the ~4 characters per token estimate, or with tiktoken when its encoding loads."""
+
+    if request.param == 'estimate':
+        monkeypatch.setattr(prompt, '_encoding', False)
+    else:
+        monkeypatch.setattr(prompt, '_encoding', None)
+        if not prompt.get_encoding():
+            pytest.skip("tiktoken encoding unavailable")
+
+    return request.param
+
+
+def turns(count):
+    return [SimpleNamespace(question=f"question {i} " + "q" * 40, answer=f"answer {i} " + "a" * 80) for i in range(count)]
+
+
+def chunks(count):
+    return [Document(page_content=f"chunk {i} " + "c" * 200) for i in range(count)]
+
+
+def prompt_tokens(query, docs, summary, messages, overhead=0):
+    return (overhead + count_tokens(query) + count_tokens(summary) + sum(turn_tokens(m) for m in messages)
+            + sum(count_tokens(d.page_content) + 1 for d in docs))
+
+
+def test_sections_are_cut_to_their_own_budgets(tokenizer):
+    budget = PromptBudget(query=10, short_term=100, long_term=20, chunks=80, total=10000)
+    messages = turns(10)
+
+    query, docs, summary, kept, usage = budget.fit("q" * 400, chunks(5), "s" * 400, messages)
+
+    assert count_tokens(query) <= 10 and query == "q" * len(query)
+    assert count_tokens(summary) <= 20 and summary == "s" * len(summary)
+    assert kept == messages[-len(kept):] and 0 < len(kept) < 10
+    assert usage['short_term'] <= 100
+    assert usage['chunks'] <= 80
+
+
+def test_oldest_turns_are_dropped_first(tokenizer):
+    budget = PromptBudget(total=10000)
+    messages, docs = turns(10), chunks(3)
+    everything = prompt_tokens("query", docs, "summary", messages)
+    budget.total = everything - 3 * turn_tokens(messages[0]) + 1
+
+    _, kept_docs, _, kept, usage = budget.fit("query", docs, "summary", messages)
+
+    assert kept == messages[3:]
+    assert kept_docs == docs
+    assert usage['total'] <= budget.total
+
+
+def test_lowest_ranked_chunks_are_dropped_after_all_turns(tokenizer):
+    budget = PromptBudget(total=10000)
+    messages, docs = turns(4), chunks(4)
+    budget.total = prompt_tokens("query", docs[:2], "summary", [])
+
+    query, kept_docs, summary, kept, usage = budget.fit("query", docs, "summary", messages)
+
+    assert kept == []
+    assert [d.page_content for d in kept_docs] == [d.page_content for d in docs[:2]]
+    assert (query, summary) == ("query", "summary")
+    assert usage['total'] <= budget.total
+
+
+def test_summary_then_query_are_truncated_last(tokenizer):
+    budget = PromptBudget(total=10000)
+    query, summary, docs = "q" * 200, "s" * 200, chunks(3)
+    best = prompt_tokens("", docs[:1], None, [])
+
+    budget.total = best + count_tokens(query) + count_tokens(summary) // 2
+    fitted_query, kept_docs, fitted_summary, kept, usage = budget.fit(query, docs, summary, turns(3))
+
+    assert kept == [] and len(kept_docs) == 1
+    assert fitted_query == query
+    assert 0 < len(fitted_summary) < len(summary)
+    assert usage['total'] <= budget.total
+
+    budget.total = best + count_tokens(query) // 2
+    fitted_query, kept_docs, fitted_summary, _, usage = budget.fit(query, docs, summary, turns(3))
+
+    assert fitted_summary == ""
+    assert 0 < len(fitted_query) < len(query)
+    assert kept_docs[0].page_content == docs[0].page_content
+    assert usage['total'] <= budget.total
+
+
+@pytest.mark.parametrize('total', [60, 150, 400, 1000, 3000])
+def test_prompt_stays_within_the_total_budget(tokenizer, total):
+    budget = PromptBudget(query=300, short_term=2000, long_term=500, chunks=1500, total=total)
+
+    query, docs, summary, messages, usage = budget.fit(
+        "q " * 500, chunks(20), "s " * 900, turns(30), overhead=40)
+
+    assert usage['total'] == prompt_tokens(query, docs, summary, messages, overhead=40)
+    assert usage['total'] <= total
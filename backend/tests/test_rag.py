@@ -0,0 +1,28 @@
+import threading
+from types import SimpleNamespace
+from app import rag
+from app.config import RagConfig
+from app.context import ChatContext
+
+
+def test_rewrite_does_not_occupy_the_retrieval_pool(monkeypatch):
+    threads = {}
+
+    def retrieve(query):
+        threads['retrieval'] = threading.current_thread().name
+        return []
+
+    def rewrite(query, context):
+        threads['rewrite'] = threading.current_thread().name
+        return query
+
+    monkeypatch.setattr(RagConfig, 'PIPELINED_RETRIEVAL', True)
+    monkeypatch.setattr(rag.pipeline, 'retriever', SimpleNamespace(get_relevant_documents=retrieve))
+    monkeypatch.setattr(rag, 'optimize_query', rewrite)
+
+    message = SimpleNamespace(id=1, question='What is ibuprofen?', answer='A pain reliever.')
+    context = ChatContext(SimpleNamespace(id=1), [message], None, 1)
+    rag.build_rag_prompt('Can I take it daily?', context)
+
+    assert threads['retrieval'].startswith('rag_')
+    assert threads['rewrite'].startswith('rag-llm')
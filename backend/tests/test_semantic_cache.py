@@ -0,0 +1,39 @@
+from app.semantic_cache import SemanticCache
+
+
+def open_cache(tmp_path, fingerprint='store-v1', **kwargs):
+    return SemanticCache(str(tmp_path / 'semantic.db'), threshold=0.95, store_fingerprint=fingerprint, **kwargs)
+
+
+def test_similar_question_returns_the_cached_answer(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.add([1.0, 0.0, 0.0], "What is ibuprofen?", "A painkiller.")
+
+    assert cache.lookup([0.99, 0.05, 0.0]) == "A painkiller."
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_answers_survive_a_restart_with_the_same_vector_store(tmp_path):
+    open_cache(tmp_path).add([1.0, 0.0], "What is ibuprofen?", "A painkiller.")
+
+    assert open_cache(tmp_path).lookup([1.0, 0.0]) == "A painkiller."
+
+
+def test_cache_is_invalidated_when_the_vector_store_changes(tmp_path):
+    open_cache(tmp_path).add([1.0, 0.0], "What is ibuprofen?", "A painkiller.")
+
+    cache = open_cache(tmp_path, fingerprint='store-v2')
+
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.conn.execute("SELECT COUNT(*) FROM semantic_answer").fetchone()[0] == 0
+    assert open_cache(tmp_path, fingerprint='store-v2').lookup([1.0, 0.0]) is None
+
+
+def test_answers_beyond_max_entries_are_not_cached(tmp_path):
+    cache = open_cache(tmp_path, max_entries=1)
+    cache.add([1.0, 0.0], "What is ibuprofen?", "A painkiller.")
+    cache.add([0.0, 1.0], "What is aspirin?", "Also a painkiller.")
+
+    assert cache.lookup([1.0, 0.0]) == "A painkiller."
+    assert cache.lookup([0.0, 1.0]) is None
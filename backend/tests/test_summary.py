@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+from app.config import RagConfig
+from app.context import ChatContext, add_message
+from app.jobs import enqueue_summary, run_next_job
+from app.models import Chat, LongTermMemory, SummaryJob, User
+from app.pipeline import pipeline
+
+
+class FakeLLM:
+    """Answers the relevance check with "Yes" and records every prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, priority=None):
+        self.prompts.append(prompt)
+        content = 'Yes' if 'Reply with only "Yes" or "No"' in prompt else f"summary {len(self.prompts)}"
+        return SimpleNamespace(content=content)
+
+
+def test_coalesced_turns_are_all_summarized(db_session, monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(pipeline, 'llm_model', llm)
+    monkeypatch.setattr(RagConfig, 'SUMMARY_GATE_ENABLED', False)
+
+    user = User(email='patient@example.com', name='Patient')
+    db_session.add(user)
+    db_session.commit()
+    chat = Chat(user_id=user.id, title='Headaches')
+    db_session.add(chat)
+    db_session.commit()
+
+    context = ChatContext.new(chat)
+    for i in range(4):
+        add_message(context, f"question {i}", f"answer {i}")
+    enqueue_summary(chat.id)
+    assert run_next_job()
+
+    # Two turns arrive before the worker runs again and are coalesced into one job
+    add_message(context, "question about ibuprofen", "answer about ibuprofen")
+    enqueue_summary(chat.id)
+    last = add_message(context, "question about dosage", "answer about dosage")
+    enqueue_summary(chat.id)
+    assert SummaryJob.query.count() == 1
+
+    assert run_next_job()
+
+    update_prompt = llm.prompts[-1]
+    assert "question about ibuprofen" in update_prompt
+    assert "question about dosage" in update_prompt
+    assert "question 3" not in update_prompt
+
+    ltm = LongTermMemory.query.filter_by(chat_id=chat.id).one()
+    assert ltm.summary == f"summary {len(llm.prompts)}"
+    assert ltm.last_message_id == last.id
+    assert SummaryJob.query.count() == 0
@@ -13,6 +13,11 @@ const mutations = {
 
       state.user.chats.unshift(chat)
     }
+  },
+  APPEND_CHATS(state, { chats, next_cursor }) {
+    const known = new Set(state.user.chats.map(c => c.chat_id))
+    state.user.chats.push(...chats.filter(c => !known.has(c.chat_id)))
+    state.user.chats_next_cursor = next_cursor
   }
 }
 
@@ -120,6 +125,26 @@ const actions = {
     }
   },
 
+  async loadMoreChats({ state, commit }) {
+    const cursor = state.user && state.user.chats_next_cursor
+    if (!cursor) return false
+
+    const res = await fetch(`http://localhost:5000/user/chats?cursor=${cursor}`, {
+      method: 'GET',
+      credentials: 'include',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-CSRF-Token': getCookie('csrf_access_token')
+      }
+    })
+
+    const response = await res.json()
+    if (!res.ok) throw new Error(response.error || 'Failed to load chats')
+
+    commit('APPEND_CHATS', response)
+    return true
+  },
+
   async refreshToken(_) {
     const res = await fetch('http://localhost:5000/auth/refresh', {
       method: 'POST',
@@ -1,3 +1,16 @@
+import argparse
 from vector_ops import init
+from vector_ops.manifest import MANIFEST_PATH, ingest_manifest
 
-init()
\ No newline at end of file
+# Guarded so worker processes (PDF extraction) can import this module safely
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build or update the FAISS vector store.")
+    parser.add_argument('--manifest', nargs='?', const=MANIFEST_PATH,
+                        help="ingest the sources listed in a manifest (default: manifest.json), only new or changed ones")
+    parser.add_argument('--rebuild', action='store_true', help="with --manifest, rebuild the index from scratch")
+    args = parser.parse_args()
+
+    if args.manifest:
+        ingest_manifest(args.manifest, rebuild=args.rebuild)
+    else:
+        init()
@@ -1,7 +1,13 @@
 import logging
 import os
+import sys
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-LOG_FILE = os.path.join(ROOT_DIR, 'backend', 'app.log')
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+LOG_FILE = os.path.join(BACKEND_DIR, 'app.log')
+
+# Embedding providers and index formats are shared with the backend app
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
 
 
 logging.basicConfig(
@@ -12,19 +18,25 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Ingestion runs from the command line, mirror its progress to the console
+console = logging.StreamHandler()
+console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+logger.addHandler(console)
+
 
 from vector_ops.embed import create_vector_store
-from langchain_mistralai import MistralAIEmbeddings
+from app.embeddings import get_embedding_model
 
 def init():
     """
     Initializes the vector store with embeddings.
     
-    This function creates a vector store using MistralAI embeddings and stores it in the specified directory.
+    This function creates a vector store using the configured embedding provider
+    (EMBEDDING_PROVIDER, MistralAI by default) and stores it in the specified directory.
     """
     
     try:
-        embedding_model = MistralAIEmbeddings(model='mistral-embed',api_key= os.environ['MISTRAL_API_KEY'],wait_time=2)
+        embedding_model = get_embedding_model()
    
         create_vector_store(embedding_model = embedding_model)
         
@@ -0,0 +1,161 @@
+import heapq
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from vector_ops import logger
+from app.rate_limit import retry_after_seconds, status_code
+
+
+MAX_CONCURRENCY = int(os.environ.get('INGEST_MAX_CONCURRENCY', 4))
+MIN_BATCH_SIZE = int(os.environ.get('INGEST_MIN_BATCH_SIZE', 8))
+MAX_BATCH_SIZE = int(os.environ.get('INGEST_MAX_BATCH_SIZE', 128))
+TARGET_LATENCY = float(os.environ.get('INGEST_TARGET_LATENCY', 5.0))
+MAX_BATCH_ATTEMPTS = int(os.environ.get('INGEST_MAX_BATCH_ATTEMPTS', 5))
+RETRY_BASE_DELAY = float(os.environ.get('INGEST_RETRY_BASE_DELAY', 1.0))
+
+
+def log_event(event, **fields):
+    """Logs a structured (JSON) ingestion event."""
+
+    logger.info(json.dumps({'event': event, **fields}))
+
+
+class AdaptiveController:
+    """
+    Adapts embedding batch size and concurrency to observed latency and rate limiting.
+
+    Additive increase while batches come back faster than the target latency,
+    multiplicative decrease on 429 responses (with a shared pause for Retry-After)
+    and on batches slower than twice the target.
+    """
+
+    def __init__(self, batch_size, max_concurrency=MAX_CONCURRENCY, min_batch_size=MIN_BATCH_SIZE,
+                 max_batch_size=MAX_BATCH_SIZE, target_latency=TARGET_LATENCY):
+
+        self.batch_size = max(min_batch_size, min(batch_size, max_batch_size))
+        self.concurrency = 1
+        self.max_concurrency = max_concurrency
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.paused_until = 0.0
+        self.rate_limited = 0
+
+    def on_success(self, latency):
+
+        if latency <= self.target_latency:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.min_batch_size)
+        elif latency > 2 * self.target_latency:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+
+    def on_rate_limited(self, retry_after):
+
+        self.rate_limited += 1
+        self.concurrency = max(1, self.concurrency // 2)
+        self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        self.paused_until = max(self.paused_until, time.time() + (retry_after if retry_after is not None else 2.0))
+
+    def can_submit(self, in_flight):
+
+        return in_flight < self.concurrency and time.time() >= self.paused_until
+
+
+def embed_concurrently(embedding_model, keys, text_by_key, on_batch, batch_size=50):
+    """
+    Embeds texts with several batches in flight through a bounded thread pool.
+
+    Finished batches are handed to `on_batch` on the calling thread, which acts as the
+    single writer. Rate-limited batches are re-queued, and other failures are re-queued
+    after an exponential delay (INGEST_RETRY_BASE_DELAY, doubled per attempt), up to
+    INGEST_MAX_BATCH_ATTEMPTS attempts per text. Attempts are counted per key, so they
+    survive a failed batch being re-split into batches of a different size.
+
+    Args:
+        embedding_model: The embeddings model.
+        keys: The keys of the texts to embed.
+        text_by_key: Mapping from key to chunk text.
+        on_batch: Callback receiving (keys, vectors) for every finished batch.
+        batch_size: Initial batch size.
+
+    Returns:
+        A dict with the final throughput statistics.
+    """
+
+    controller = AdaptiveController(batch_size)
+    pending = deque(keys)
+    attempts = {}
+    delayed = []
+    in_flight = {}
+    done = 0
+    start = time.perf_counter()
+    last_report = start
+
+    def embed(batch_keys):
+        started = time.perf_counter()
+        vectors = embedding_model.embed_documents([text_by_key[k] for k in batch_keys])
+        return vectors, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=controller.max_concurrency, thread_name_prefix='embed') as pool:
+        while pending or in_flight or delayed:
+            while delayed and delayed[0][0] <= time.time():
+                pending.extendleft(reversed(heapq.heappop(delayed)[2]))
+
+            while pending and controller.can_submit(len(in_flight)):
+                batch_keys = [pending.popleft() for _ in range(min(controller.batch_size, len(pending)))]
+                in_flight[pool.submit(embed, batch_keys)] = batch_keys
+
+            if not in_flight:
+                # Paused by a 429, or waiting for the next delayed retry
+                resume_at = min(([controller.paused_until] if pending else []) + [ready for ready, _, _ in delayed[:1]])
+                time.sleep(max(0.1, resume_at - time.time()))
+                continue
+
+            finished, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                batch_keys = in_flight.pop(future)
+
+                try:
+                    vectors, latency = future.result()
+
+                except Exception as e:
+                    if status_code(e) == 429:
+                        controller.on_rate_limited(retry_after_seconds(e))
+                        log_event('ingest.rate_limited', batch_size=controller.batch_size,
+                                  concurrency=controller.concurrency,
+                                  pause=round(max(0.0, controller.paused_until - time.time()), 2))
+                        pending.extendleft(reversed(batch_keys))
+                    else:
+                        attempt = max(attempts.get(k, 0) for k in batch_keys) + 1
+                        attempts.update((k, attempt) for k in batch_keys)
+                        if attempt >= MAX_BATCH_ATTEMPTS:
+                            raise
+
+                        delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                        heapq.heappush(delayed, (time.time() + delay, id(batch_keys), batch_keys))
+                        log_event('ingest.batch_failed', error=str(e), attempt=attempt, retry_in=delay)
+
+                    continue
+
+                on_batch(batch_keys, vectors)
+                controller.on_success(latency)
+                done += len(batch_keys)
+
+                now = time.perf_counter()
+                if now - last_report >= 5 or not (pending or in_flight or delayed):
+                    last_report = now
+                    log_event('ingest.progress', embedded=done, total=len(keys),
+                              chunks_per_sec=round(done / (now - start), 2),
+                              batch_size=controller.batch_size, concurrency=controller.concurrency,
+                              last_batch_latency=round(latency, 2))
+
+    elapsed = time.perf_counter() - start
+    stats = {'embedded': done, 'seconds': round(elapsed, 2),
+             'chunks_per_sec': round(done / elapsed, 2) if elapsed else 0.0,
+             'rate_limited': controller.rate_limited}
+    log_event('ingest.embedded', **stats)
+
+    return stats
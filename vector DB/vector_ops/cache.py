@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sqlite3
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache')
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed store of chunk embeddings.
+
+    Vectors are keyed by hash(model, chunk text), so a rerun, or a run with different
+    chunking parameters, only has to embed chunks that have never been seen with this model.
+    Every `put_many` call is committed immediately and acts as a checkpoint.
+    """
+
+    def __init__(self, model_name, path=None):
+        """
+        Args:
+            model_name: Identifier of the embedding model, part of every key.
+            path: Path of the SQLite cache file.
+        """
+
+        self.model_name = model_name
+        self.path = path or os.path.join(CACHE_DIR, 'embeddings.db')
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_embedding (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def key(self, text):
+        """Returns the content address of a chunk text under this model."""
+
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Looks up several keys.
+
+        Returns:
+            A dict mapping every found key to its float32 vector.
+        """
+
+        found = {}
+        keys = list(keys)
+
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM chunk_embedding WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update((k, np.frombuffer(v, dtype='float32')) for k, v in rows)
+
+        return found
+
+    def missing(self, keys):
+        """Returns the unique keys that are not cached yet, in first-seen order."""
+
+        unique = list(dict.fromkeys(keys))
+        found = self.get_many(unique)
+        return [k for k in unique if k not in found]
+
+    def put_many(self, items):
+        """
+        Stores (key, vector) pairs and commits them as a checkpoint.
+
+        Args:
+            items: An iterable of (key, vector) pairs.
+        """
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunk_embedding (key, vector) VALUES (?, ?)",
+            [(k, np.asarray(v, dtype='float32').tobytes()) for k, v in items]
+        )
+        self.conn.commit()
+
+    def put_many_pairs(self, keys, vectors):
+        """Stores parallel lists of keys and vectors (batch callback form of `put_many`)."""
+
+        self.put_many(zip(keys, vectors))
@@ -1,16 +1,41 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib
 import os
+from vector_ops import logger
 
 
 
-def create_chunks(doc):
+def create_chunks(doc, chunk_size=500, chunk_overlap=50):
     """Split documents into smaller chunks for efficient processing."""
     
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
         )   
     split_docs = splitter.split_documents(doc)  
-    print(f'Total Chunks: {len(split_docs)}')   
+    logger.info(f'Total Chunks: {len(split_docs)}')
     return split_docs
 
+
+def assign_chunk_ids(split_docs):
+    """
+    Assign deterministic ids to chunks from their source, page and content.
+
+    Identical chunks on the same page get a numeric suffix so ids stay unique.
+
+    Returns:
+        The list of chunk ids, also set as `id` on every document.
+    """
+    
+    ids = []
+    seen = {}
+    for doc in split_docs:
+        base = hashlib.sha1(
+            f"{doc.metadata.get('source')}|{doc.metadata.get('page')}|{doc.page_content}".encode('utf-8')
+        ).hexdigest()[:20]
+        
+        seen[base] = seen.get(base, 0) + 1
+        doc.id = base if seen[base] == 1 else f"{base}-{seen[base] - 1}"
+        ids.append(doc.id)
+    
+    return ids
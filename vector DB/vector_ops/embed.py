@@ -1,32 +1,63 @@
+import json
 import os
 from langchain_community.vectorstores import FAISS
-from langchain_mistralai import MistralAIEmbeddings
 import time
-from vector_ops.chunks import create_chunks
+from vector_ops.batching import embed_concurrently
+from vector_ops.cache import EmbeddingCache
+from vector_ops.chunks import assign_chunk_ids, create_chunks
 from vector_ops.loader import load_documents    
 from dotenv import load_dotenv
 from vector_ops import logger
+from app.ann_index import build_index, index_vectors, recall_report, to_flat
+from app.config import RagConfig
+from app.docstore import save_vector_store
+from app.embeddings import embedding_model_name, write_embedding_meta
 load_dotenv()
 
 
+EMBEDDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),'embeddings')
 
 
-def create_vector_store(embedding_model, batch_size=50):
-    """Load or create a FAISS vector store from the provided documents."""
+def finalize_index(vector_store):
+    """
+    Replaces the exact index with the configured index type (RagConfig.INDEX_TYPE).
+
+    For approximate indexes a recall@k check against the exact flat index is run on
+    held-out queries and written to index_report.json next to the index.
+
+    Returns:
+        The recall report, or None for a flat index.
+    """
+    
+    flat = to_flat(vector_store.index)
+    vector_store.index = flat
     
+    if RagConfig.INDEX_TYPE == 'flat':
+        return None
 
-    EMBEDDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),'embeddings')
+    msg = f"⚙️ Building {RagConfig.INDEX_TYPE.upper()} index over {flat.ntotal} vectors..."
+    logger.info(msg)
     
-    embedding_model = MistralAIEmbeddings(
-            model='mistral-embed',
-            api_key= os.environ.get('MISTRAL_API_KEY'),
-            wait_time=2
-        )
+    vector_store.index = build_index(index_vectors(flat))
+    report = recall_report(vector_store.index, flat)
+
+    with open(os.path.join(EMBEDDINGS_DIR, 'index_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
 
+def create_vector_store(embedding_model, batch_size=50):
+    """
+    Create a FAISS vector store from the source documents.
+
+    Chunk embeddings are content-addressed in a persistent cache and checkpointed after every
+    batch, so an interrupted or re-chunked build only embeds chunks it has not seen before.
+    The final index is assembled from the cached vectors.
+    """
     
     if not os.path.exists(EMBEDDINGS_DIR):
         msg = f"Creating embeddings directory at {EMBEDDINGS_DIR}"
-        print(msg)
         logger.info(msg)
         os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
     
@@ -35,7 +66,6 @@ def create_vector_store(embedding_model, batch_size=50):
     
     try:
         msg = "⚙️ Building FAISS vector store in batches..."
-        print(msg)
         logger.info(msg)
         start = time.time()
 
@@ -45,39 +75,44 @@ def create_vector_store(embedding_model, batch_size=50):
         split_docs = create_chunks(doc)
             
             
-        first_batch = split_docs[:batch_size]
-        vector_store = FAISS.from_documents(first_batch, embedding_model)
-        total_batches = (len(split_docs) + batch_size - 1) // batch_size
+        chunk_ids = assign_chunk_ids(split_docs)
+        texts = [d.page_content for d in split_docs]
 
-        batch_msg = f"Batch 1/{total_batches} completed"
-        print(batch_msg)
-        logger.info(batch_msg)
-            
-        for i in range(batch_size, len(split_docs), batch_size):
-            batch = split_docs[i:i + batch_size]
-            vector_store.add_documents(batch)
-            batch_num = (i // batch_size) + 1
-            
-            batch_msg = f"Batch {batch_num}/{total_batches} completed"
-            print(batch_msg)
-            logger.info(batch_msg)
+        # Only embed chunks whose content has never been embedded with this model
+        cache = EmbeddingCache(embedding_model_name())
+        keys = [cache.key(t) for t in texts]
+        missing = cache.missing(keys)
+        text_by_key = dict(zip(keys, texts))
+
+        cache_msg = f"{len(texts) - len(missing)}/{len(texts)} chunk embeddings found in cache, {len(missing)} to embed"
+        logger.info(cache_msg)
+
+        embed_concurrently(embedding_model, missing, text_by_key, on_batch=cache.put_many_pairs, batch_size=batch_size)
+
+        # Assemble the index from cached vectors
+        cached = cache.get_many(keys)
+        vector_store = FAISS.from_embeddings(
+            [(text, cached[key].tolist()) for text, key in zip(texts, keys)],
+            embedding_model,
+            metadatas=[d.metadata for d in split_docs],
+            ids=chunk_ids
+        )
 
-        vector_store.save_local(EMBEDDINGS_DIR)
+        finalize_index(vector_store)
+        save_vector_store(vector_store, EMBEDDINGS_DIR)
+        write_embedding_meta(EMBEDDINGS_DIR, vector_store.index.d)
         end = time.time()
         
         success_msg = f"✅ FAISS vector store created and saved at '{EMBEDDINGS_DIR}'"
-        print(success_msg)
         logger.info(success_msg)
         
         time_msg = f"⏱️ Time taken: {int((end - start) // 60)} min {int((end - start) % 60)} sec"
-        print(time_msg)
         logger.info(time_msg)
 
         return vector_store
        
     except Exception as e:
         error_msg = f"❌ Error creating FAISS vector store: {e}"
-        print(error_msg)
         logger.error(error_msg)
         
          
@@ -1,24 +1,204 @@
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pypdf import PdfReader
 from vector_ops import logger
+from vector_ops.cache import CACHE_DIR
+import hashlib
 import os
+import sqlite3
+import time
+import zlib
+
+
+DOCUMENTS_DIR = os.path.join(os.path.dirname(__file__),'documents')
+
+PDF_FILENAME = 'The-Gale-Encyclopedia-of-Medicine-3rd-Edition-staibabussalamsula.ac_.id_.pdf'
+
+# Encyclopedia content pages (front matter and index excluded)
+PAGE_START = 30
+PAGE_END = 4091
+
+
+def file_hash(path):
+    """Returns the SHA-256 of a file, used to key its extracted pages."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class PageStore:
+    """
+    Persistent per-page text store keyed by (PDF hash, page number), zlib-compressed.
+
+    It also remembers the hash and page count of each PDF file, so a document whose
+    pages are all cached is neither re-hashed nor opened while its file is unchanged.
+    """
+
+    def __init__(self, path=None):
+
+        self.path = path or os.path.join(CACHE_DIR, 'pages.db')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_text (
+                pdf_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                page_label TEXT,
+                text BLOB NOT NULL,
+                PRIMARY KEY (pdf_hash, page)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_file (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                pdf_hash TEXT NOT NULL,
+                page_count INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def describe(self, pdf_path):
+        """
+        Returns the SHA-256 and page count of a PDF.
+
+        Both are read from the store while the file's size and modification time match the
+        stored ones; otherwise the file is hashed, and opened only if no file with the same
+        hash was counted before.
+
+        Returns:
+            A tuple of (pdf_hash, page_count).
+        """
+
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+
+        row = self.conn.execute(
+            "SELECT pdf_hash, page_count FROM pdf_file WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row
+
+        pdf_hash = file_hash(path)
+        row = self.conn.execute("SELECT page_count FROM pdf_file WHERE pdf_hash = ?", (pdf_hash,)).fetchone()
+        page_count = row[0] if row else len(PdfReader(path).pages)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pdf_file (path, size, mtime_ns, pdf_hash, page_count) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, pdf_hash, page_count)
+        )
+        self.conn.commit()
+
+        return pdf_hash, page_count
+
+    def get_range(self, pdf_hash, start, end):
+        """Returns {page: (page_label, text)} for the cached pages in [start, end)."""
+
+        rows = self.conn.execute(
+            "SELECT page, page_label, text FROM page_text WHERE pdf_hash = ? AND page >= ? AND page < ?",
+            (pdf_hash, start, end)
+        ).fetchall()
+
+        return {page: (label, zlib.decompress(text).decode('utf-8')) for page, label, text in rows}
+
+    def put_many(self, pdf_hash, pages):
+        """Stores (page, page_label, text) tuples."""
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO page_text (pdf_hash, page, page_label, text) VALUES (?, ?, ?, ?)",
+            [(pdf_hash, page, label, zlib.compress(text.encode('utf-8'))) for page, label, text in pages]
+        )
+        self.conn.commit()
+
+
+def extract_pages(pdf_path, pages):
+    """
+    Extracts the text of some pages of a PDF (runs in a worker process).
+
+    Returns:
+        A list of (page, page_label, text) tuples.
+    """
+
+    reader = PdfReader(pdf_path)
+    labels = reader.page_labels
+
+    return [(page, labels[page] if page < len(labels) else str(page + 1), reader.pages[page].extract_text())
+            for page in pages]
+
+
+def load_pages(pdf_path, start, end, workers=None, store=None):
+    """
+    Loads the pages [start, end) of a PDF as documents, extracting only uncached pages.
+
+    Missing pages are split into contiguous ranges and extracted across a process pool;
+    the text is persisted per page, and the PDF's hash and page count with it, so later
+    builds skip PDF parsing entirely.
+
+    Args:
+        pdf_path: Path of the PDF file.
+        start: First page (0-based, inclusive).
+        end: Last page (exclusive).
+        workers: Number of extraction processes (defaults to the CPU count).
+        store: The PageStore to use.
+
+    Returns:
+        A list of Document objects, one per page, in page order.
+    """
+
+    store = store or PageStore()
+    pdf_hash, total_pages = store.describe(pdf_path)
+
+    end = min(end, total_pages)
+    if start >= end:
+        return []
+
+    cached = store.get_range(pdf_hash, start, end)
+    missing = [p for p in range(start, end) if p not in cached]
+
+    logger.info(f"{len(cached)}/{end - start} pages of '{os.path.basename(pdf_path)}' found in page store, "
+                f"{len(missing)} to extract")
+
+    if missing:
+        begin = time.time()
+        workers = workers or os.cpu_count() or 1
+        size = max(1, -(-len(missing) // (workers * 4)))
+        ranges = [missing[i:i + size] for i in range(0, len(missing), size)]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(extract_pages, pdf_path, pages) for pages in ranges]
+            for future in as_completed(futures):
+                pages = future.result()
+                store.put_many(pdf_hash, pages)
+                cached.update((page, (label, text)) for page, label, text in pages)
+
+        logger.info(f"Extracted {len(missing)} pages with {workers} processes in {time.time() - begin:.1f}s")
+
+    return [
+        Document(
+            page_content=cached[page][1],
+            metadata={'source': pdf_path, 'page': page, 'page_label': cached[page][0], 'total_pages': total_pages}
+        )
+        for page in range(start, end)
+    ]
+
 
 def load_documents():
     '''Load and preprocess documents from a PDF file for RAG'''
-    
-    DOCUMENTS_DIR = os.path.join(os.path.dirname(__file__),'documents')
-    
-    PDF_FILENAME = 'The-Gale-Encyclopedia-of-Medicine-3rd-Edition-staibabussalamsula.ac_.id_.pdf'
-    
-    if not os.path.exists(os.path.join(DOCUMENTS_DIR, PDF_FILENAME)): 
+
+    if not os.path.exists(os.path.join(DOCUMENTS_DIR, PDF_FILENAME)):
         path_msg = f"PDF file '{PDF_FILENAME}' not found in {DOCUMENTS_DIR}"
         logger.error(path_msg)
         raise FileNotFoundError(path_msg)
-    
-    
+
+
     pdf_path = os.path.join(DOCUMENTS_DIR, PDF_FILENAME)
-    pdf_loader = PyPDFLoader(pdf_path)
-    
-    doc  = pdf_loader.load()
-    doc = doc[30:4091]
-    return doc
 
+    return load_pages(pdf_path, PAGE_START, PAGE_END)
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.vectorstores import FAISS
+from vector_ops import logger
+from vector_ops.batching import embed_concurrently, log_event
+from vector_ops.cache import EmbeddingCache
+from vector_ops.chunks import assign_chunk_ids, create_chunks
+from vector_ops.embed import EMBEDDINGS_DIR, finalize_index
+from vector_ops.loader import DOCUMENTS_DIR, PageStore, load_pages
+from app.ann_index import to_flat
+from app.docstore import open_vector_store, save_vector_store
+from app.embeddings import embedding_model_name, get_embedding_model, write_embedding_meta
+
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'manifest.json')
+STATE_PATH = os.path.join(EMBEDDINGS_DIR, 'sources.json')
+
+PAGE_WINDOW = int(os.environ.get('INGEST_PAGE_WINDOW', 250))
+SOURCE_WORKERS = int(os.environ.get('INGEST_SOURCE_WORKERS', 2))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Loads and validates the ingestion manifest.
+
+    Each source needs a unique `name` and a PDF `path` (relative to vector_ops/documents);
+    `pages` ([start, end), 0-based), `chunk_size`, `chunk_overlap` and `metadata` are optional.
+
+    Returns:
+        The list of sources with defaults filled in.
+    """
+
+    with open(path) as f:
+        manifest = json.load(f)
+
+    sources = []
+    names = set()
+    for source in manifest.get('sources', []):
+        if not source.get('name') or not source.get('path'):
+            raise ValueError(f"Manifest source {source} needs a 'name' and a 'path'.")
+        if source['name'] in names:
+            raise ValueError(f"Duplicate manifest source name '{source['name']}'.")
+        names.add(source['name'])
+
+        pages = source.get('pages') or [0, sys.maxsize]
+        sources.append({
+            'name': source['name'],
+            'path': os.path.join(DOCUMENTS_DIR, source['path']),
+            'pages': [int(pages[0]), int(pages[1])],
+            'chunk_size': int(source.get('chunk_size', 500)),
+            'chunk_overlap': int(source.get('chunk_overlap', 50)),
+            'metadata': source.get('metadata', {})
+        })
+
+    return sources
+
+
+def source_fingerprint(source, pdf_hash):
+    """Fingerprints everything that affects a source's chunks: file content, page range, chunking and metadata."""
+
+    payload = {k: source[k] for k in ('pages', 'chunk_size', 'chunk_overlap', 'metadata')}
+    payload['pdf_hash'] = pdf_hash
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_state():
+    """Returns the ingestion state of the existing index ({} if there is none)."""
+
+    if not os.path.exists(STATE_PATH):
+        return {}
+
+    with open(STATE_PATH) as f:
+        return json.load(f)
+
+
+def ingest_source(source, fingerprint, embedding_model):
+    """
+    Streams one source through load -> chunk -> embed, one page window at a time.
+
+    Returns:
+        A list of (document, vector) pairs for every chunk of the source.
+    """
+
+    cache = EmbeddingCache(embedding_model_name())
+    store = PageStore()
+    start, end = source['pages']
+    chunks = []
+
+    for window_start in range(start, end, PAGE_WINDOW):
+        pages = load_pages(source['path'], window_start, min(end, window_start + PAGE_WINDOW), store=store)
+        if not pages:
+            break
+
+        docs = create_chunks(pages, source['chunk_size'], source['chunk_overlap'])
+        for doc in docs:
+            doc.metadata.update(source['metadata'], source_name=source['name'], source_version=fingerprint[:12])
+        assign_chunk_ids(docs)
+
+        keys = [cache.key(doc.page_content) for doc in docs]
+        embed_concurrently(embedding_model, cache.missing(keys),
+                           {k: doc.page_content for k, doc in zip(keys, docs)}, on_batch=cache.put_many_pairs)
+        chunks.extend(zip(docs, keys))
+
+        log_event('ingest.source_window', source=source['name'], pages=[window_start, window_start + len(pages)],
+                  chunks=len(docs))
+
+    vectors = cache.get_many(key for _, key in chunks)
+    return [(doc, vectors[key]) for doc, key in chunks]
+
+
+def ingest_manifest(path=MANIFEST_PATH, rebuild=False):
+    """
+    Ingests the sources listed in the manifest into the vector store.
+
+    Unchanged sources are skipped. New and changed sources run as parallel per-document
+    pipelines, their old chunks are removed from the existing index, and their new chunks
+    are added. Sources no longer listed are removed. Without previous ingestion state, or
+    with `rebuild`, the index is built from scratch (embeddings still come from the cache).
+
+    Args:
+        path: Path of the manifest JSON file.
+        rebuild: Ignore the existing index and rebuild it.
+
+    Returns:
+        The FAISS vector store.
+    """
+
+    start = time.time()
+    sources = load_manifest(path)
+    embedding_model = get_embedding_model()
+    model_name = embedding_model_name()
+
+    state = {} if rebuild else load_state()
+    index_exists = os.path.exists(os.path.join(EMBEDDINGS_DIR, 'index.faiss'))
+    if not index_exists or state.get('embedding') != model_name:
+        state = {}
+    previous = state.get('sources', {})
+
+    store = PageStore()
+    changed = []
+    for source in sources:
+        if not os.path.exists(source['path']):
+            path_msg = f"PDF file '{source['path']}' of source '{source['name']}' not found"
+            logger.error(path_msg)
+            raise FileNotFoundError(path_msg)
+
+        pdf_hash, _ = store.describe(source['path'])
+        fingerprint = source_fingerprint(source, pdf_hash)
+        if previous.get(source['name'], {}).get('fingerprint') != fingerprint:
+            changed.append((source, fingerprint))
+
+    listed = {s['name'] for s in sources}
+    removed = [name for name in previous if name not in listed]
+
+    log_event('ingest.plan', sources=len(sources), changed=[s['name'] for s, _ in changed], removed=removed)
+
+    vector_store = open_vector_store(EMBEDDINGS_DIR, embedding_model, lazy=False) if previous else None
+
+    if not changed and not removed:
+        logger.info("✅ Vector store is up to date with the manifest.")
+        return vector_store
+
+    if vector_store is not None:
+        # Approximate indexes cannot remove vectors, update an exact copy and rebuild afterwards
+        vector_store.index = to_flat(vector_store.index)
+
+    with ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix='source') as pool:
+        futures = {source['name']: (pool.submit(ingest_source, source, fingerprint, embedding_model), fingerprint)
+                   for source, fingerprint in changed}
+        results = {name: (future.result(), fingerprint) for name, (future, fingerprint) in futures.items()}
+
+    # Drop chunks of changed and removed sources from the existing index
+    stale_ids = [i for name in list(results) + removed for i in previous.get(name, {}).get('ids', [])]
+    if vector_store is not None and stale_ids:
+        vector_store.delete(stale_ids)
+
+    sources_state = {name: info for name, info in previous.items() if name in listed}
+    for name, (chunks, fingerprint) in results.items():
+        text_embeddings = [(doc.page_content, vector.tolist()) for doc, vector in chunks]
+        metadatas = [doc.metadata for doc, _ in chunks]
+        ids = [doc.id for doc, _ in chunks]
+
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas, ids=ids)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+        sources_state[name] = {'fingerprint': fingerprint, 'chunks': len(ids), 'ids': ids}
+
+    os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+    finalize_index(vector_store)
+    save_vector_store(vector_store, EMBEDDINGS_DIR)
+    write_embedding_meta(EMBEDDINGS_DIR, vector_store.index.d)
+
+    with open(STATE_PATH, 'w') as f:
+        json.dump({'embedding': model_name, 'sources': sources_state}, f)
+
+    log_event('ingest.done', seconds=round(time.time() - start, 1), total_chunks=vector_store.index.ntotal,
+              ingested=list(results), removed=removed)
+    logger.info(f"✅ FAISS vector store updated from manifest and saved at '{EMBEDDINGS_DIR}'")
+
+    return vector_store